@@ -0,0 +1,118 @@
+"""Decoding cost of Primo search responses with each available JSON backend.
+
+    python benchmarks/bench_json.py [payload.json ...]
+
+Pass recorded `/primaws/rest/pub/pnxs` response bodies (e.g. saved from the
+browser's network tab on a group search). Without any, a synthetic search page
+of 50 full PNX documents is used. Install the optional backend with
+`pip install omnis-py[orjson]`.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from omnis.client import default_json_loads
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def synthetic_search(docs: int = 50) -> bytes:
+    def doc(i: int) -> Dict[str, Any]:
+        return {
+            "context": "L",
+            "adaptor": "Local Search Engine",
+            "pnx": {
+                "control": {
+                    "sourcerecordid": [f"99{i:014d}05606"],
+                    "recordid": [f"alma99{i:014d}05606"],
+                    "sourceid": ["alma"],
+                    "sourcesystem": ["ILS"],
+                },
+                "display": {
+                    "type": ["book"],
+                    "title": [f"Płomień i krzyż. T. {i % 4 + 1}, Czas próby"],
+                    "creator": ["Sapkowski, Andrzej (1948- ). Autor$$QSapkowski, Andrzej"],
+                    "publisher": ["Warszawa : Wydawnictwo Literackie, 2019"],
+                    "edition": [f"Wydanie {i % 3 + 1}."],
+                    "format": ["420, [4] strony ; 21 cm"],
+                    "subject": ["Literatura polska -- 21 w.", "Powieść fantastyczna", "Polska -- historia"],
+                    "genre": ["Powieść", "Fantastyka"],
+                    "language": ["pol"],
+                    "description": ["Druga część cyklu opowiadająca o losach bohaterów w czasie wojny. " * 3],
+                },
+                "addata": {
+                    "btitle": ["Płomień i krzyż"],
+                    "au": ["Sapkowski, Andrzej"],
+                    "pub": ["Wydawnictwo Literackie"],
+                    "date": ["2019"],
+                    "isbn": [f"97883{i:08d}", f"83{i:08d}"],
+                    "seriestitle": ["Płomień i krzyż"],
+                },
+                "facets": {
+                    "frbrgroupid": ["1234567890"],
+                    "frbrtype": ["6"],
+                    "library": [f"BR{i % 12}", f"BR{i % 7}"],
+                },
+                "search": {"title": ["płomień i krzyż czas próby"] * 4, "creator": ["sapkowski andrzej"] * 3},
+            },
+            "delivery": {
+                "bestlocation": {"mainLocation": f"Filia {i % 70}", "availabilityStatus": "available"},
+                "holding": [
+                    {
+                        "mainLocation": f"Filia {(i + h) % 70}",
+                        "libraryCode": f"BR{h}",
+                        "availabilityStatus": "available",
+                    }
+                    for h in range(6)
+                ],
+            },
+        }
+
+    return json.dumps(
+        {"info": {"total": docs, "first": 1, "last": docs}, "docs": [doc(i) for i in range(docs)]}
+    ).encode()
+
+
+def best_of(decode: Callable[[bytes], Any], payloads: List[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("payloads", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = [path.read_bytes() for path in args.payloads] or [synthetic_search()] * 30
+    size = sum(len(p) for p in payloads) / 2**20
+    print(f"{len(payloads)} payloads, {size:.1f} MiB; default_json_loads = {default_json_loads.__module__}")
+
+    backends: Dict[str, Callable[[bytes], Any]] = {
+        "httpx .json()": lambda content: httpx.Response(200, content=content).json(),
+        "json.loads": json.loads,
+    }
+    if orjson is not None:
+        backends["orjson.loads"] = orjson.loads
+    baseline = None
+    for name, decode in backends.items():
+        seconds = best_of(decode, payloads, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {name:<14} {seconds * 1000:8.1f} ms  {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""CPU and memory cost of building loan and search-result models in bulk.
+
+Runs on a synthetic 10k-loan history and a wide search of 10k editions with
+three branches each:
+
+    python benchmarks/bench_models.py [--loans 10000]
+
+`Loan.from_api` validates each raw record as-is. The previous version copied
+the record into keyword arguments instead, and that path is timed as "kwargs".
+Skipping validation with `model_construct` is timed too. It runs in Python,
+while validation runs in pydantic-core, so on pydantic 2.x it is the slowest
+of the three and the client doesn't use it.
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from omnis.client import BookVersion, BranchAvailability, Loan
+
+
+def loan_records(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "loanid": str(23000000000000 + i),
+            "mmsid": str(9910000000000000 + i),
+            "title": f"Tytuł książki numer {i} : powieść",
+            "author": "Nazwisko, Imię",
+            "duedate": "20240115",
+            "duehour": "2359",
+            "loandate": "20231215",
+            "loanstatus": "ACTIVE",
+            "ilsinstitutionname": "Biblioteka Publiczna",
+            "mainlocationname": f"Filia {i % 70}",
+            "secondarylocationname": "Wypożyczalnia",
+            "itembarcode": f"B{i:08d}",
+            "renew": "Y" if i % 3 else "N",
+            "itemcategoryname": "Książka",
+            "callnumber": f"821-3 {i}",
+        }
+        for i in range(count)
+    ]
+
+
+def version_values(count: int) -> List[Dict[str, Any]]:
+    branch = {"library_code": "BR", "sub_location": "Wypożyczalnia", "maps_url": None, "status": "available"}
+    return [
+        {
+            "mmsid": str(9910000000000000 + i),
+            "title": f"Tytuł książki numer {i}",
+            "author": "Nazwisko, Imię",
+            "edition": "Wyd. 2",
+            "publisher": "Wydawnictwo",
+            "publication_date": "2019",
+            "isbns": ["9788324150123"],
+            "frbrgroupid": str(i // 4),
+            "series": None,
+            "genres": ["Powieść"],
+            "subjects": ["Literatura polska"],
+            "language": "pol",
+            "physical_description": "320 s.",
+            "branches": [{**branch, "library_name": f"Filia {(i + b) % 70}"} for b in range(3)],
+        }
+        for i in range(count)
+    ]
+
+
+def loans_kwargs(records: List[Dict[str, Any]]) -> List[Loan]:
+    return [Loan(**{**r, "renewable": r.get("renew") == "Y"}) for r in records]
+
+
+def loans_from_api(records: List[Dict[str, Any]]) -> List[Loan]:
+    return [Loan.from_api(r) for r in records]
+
+
+def loans_constructed(records: List[Dict[str, Any]]) -> List[Loan]:
+    fields = [(name, field.alias or name) for name, field in Loan.model_fields.items() if name != "renewable"]
+    return [
+        Loan.model_construct(renewable=r.get("renew") == "Y", **{name: r.get(key) for name, key in fields})
+        for r in records
+    ]
+
+
+def versions_validated(values: List[Dict[str, Any]]) -> List[BookVersion]:
+    return [BookVersion(**{**v, "branches": [BranchAvailability(**b) for b in v["branches"]]}) for v in values]
+
+
+def versions_constructed(values: List[Dict[str, Any]]) -> List[BookVersion]:
+    return [
+        BookVersion.model_construct(
+            **{
+                **v,
+                "branches": [
+                    BranchAvailability.model_construct(**b, due_date=None, overdue=False) for b in v["branches"]
+                ],
+            }
+        )
+        for v in values
+    ]
+
+
+def measure(build: Callable[[Any], List[Any]], data: Any, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    kept = build(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"seconds": best, "peak_mib": peak / 2**20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records, values = loan_records(args.loans), version_values(args.loans)
+    # Every path must build the same models.
+    assert loans_from_api(records[:50]) == loans_kwargs(records[:50]) == loans_constructed(records[:50])
+    assert versions_constructed(values[:50]) == versions_validated(values[:50])
+
+    for label, data, paths in [
+        ("Loan", records, [("kwargs", loans_kwargs), ("from_api", loans_from_api), ("construct", loans_constructed)]),
+        ("BookVersion+branches", values, [("validated", versions_validated), ("construct", versions_constructed)]),
+    ]:
+        print(f"{label} x {args.loans}:")
+        baseline = None
+        for name, build in paths:
+            result = measure(build, data, args.repeat)
+            baseline = baseline or result["seconds"]
+            print(
+                f"  {name:<10} {result['seconds'] * 1000:8.1f} ms  {result['peak_mib']:7.2f} MiB peak"
+                f"  {baseline / result['seconds']:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
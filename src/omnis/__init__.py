@@ -1,4 +1,21 @@
-from .client import OmnisClient, Loan, UserInfo, SearchResult, BookVersion, BranchAvailability, Fine, RequestItem
+from .client import (
+    OmnisClient,
+    Loan,
+    UserInfo,
+    SearchResult,
+    SearchUpdate,
+    SearchDepth,
+    SearchBudgetExceeded,
+    BookVersion,
+    BranchAvailability,
+    Fine,
+    RequestItem,
+)
+from .availability import AvailabilityMatrix, BranchChoice, availability_matrix, best_branch
+from .cache import CacheStore
+from .history import LoanHistoryStore
+from .pool import OmnisClientPool
+from .sessions import SessionStore
 from .tenants import KNOWN_TENANTS, Tenant
 
 __all__ = [
@@ -6,10 +23,21 @@ __all__ = [
     "Loan",
     "UserInfo",
     "SearchResult",
+    "SearchUpdate",
+    "SearchDepth",
+    "SearchBudgetExceeded",
     "BookVersion",
     "BranchAvailability",
     "Fine",
     "RequestItem",
+    "AvailabilityMatrix",
+    "BranchChoice",
+    "availability_matrix",
+    "best_branch",
+    "OmnisClientPool",
+    "CacheStore",
+    "LoanHistoryStore",
+    "SessionStore",
     "KNOWN_TENANTS",
     "Tenant",
 ]
@@ -0,0 +1,86 @@
+"""Title × branch availability across the works of one search.
+
+`search_books` reports availability per work, edition and branch. Planning a
+visit ("which branch has all four volumes of the series on the shelf?") needs
+the transposed view: for every branch, which of the works can be borrowed
+there. `availability_matrix` builds it from one (multi-branch or unfiltered)
+search, and `best_branch` picks the branch that covers the most volumes, so a
+single search replaces running `--search --branch X` once per branch.
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from pydantic import BaseModel
+
+from .client import BranchAvailability, SearchResult
+
+# Lower is better when several editions of a work sit in the same branch.
+_STATUS_RANK = {"available": 0, "unavailable": 1}
+
+
+class AvailabilityMatrix(BaseModel):
+    # Row labels: one per work, in the order the results were given.
+    works: List[str]
+    # Column labels: every branch holding at least one of the works, sorted by name.
+    branches: List[str]
+    # cells[row][branch] is the best copy of that work in that branch; absent if none.
+    cells: List[Dict[str, BranchAvailability]]
+
+    def available_at(self, branch: str) -> List[int]:
+        """Rows (works) with a copy on the shelf in `branch`."""
+        return [row for row, cells in enumerate(self.cells) if branch in cells and cells[branch].status == "available"]
+
+
+class BranchChoice(BaseModel):
+    branch: str
+    # Volume labels available in the branch, and the ones that aren't.
+    volumes: List[str]
+    missing: List[str]
+
+
+def _better(candidate: BranchAvailability, current: Optional[BranchAvailability]) -> bool:
+    if current is None:
+        return True
+    return _STATUS_RANK.get(candidate.status, 2) < _STATUS_RANK.get(current.status, 2)
+
+
+def availability_matrix(results: Sequence[SearchResult]) -> AvailabilityMatrix:
+    cells: List[Dict[str, BranchAvailability]] = []
+    for result in results:
+        row: Dict[str, BranchAvailability] = {}
+        for version in result.versions:
+            for branch in version.branches:
+                if _better(branch, row.get(branch.library_name)):
+                    row[branch.library_name] = branch
+        cells.append(row)
+    branches = sorted({name for row in cells for name in row})
+    return AvailabilityMatrix(works=[r.title for r in results], branches=branches, cells=cells)
+
+
+def best_branch(
+    matrix: AvailabilityMatrix,
+    volumes: Optional[Mapping[str, Sequence[int]]] = None,
+    preferred: Sequence[str] = (),
+) -> Optional[BranchChoice]:
+    """The branch where the most volumes can be borrowed right now, or None if none can.
+
+    `volumes` maps a volume label to the matrix rows it covers, since one volume
+    may be split across several works (e.g. a renamed reissue). By default every
+    work is its own volume. Ties go to the first branch matching `preferred`
+    (case-insensitive name fragments, in order), then to the branch name.
+    """
+    if volumes is None:
+        volumes = {work: [row] for row, work in enumerate(matrix.works)}
+    needles = [p.lower() for p in preferred]
+
+    def preference(branch: str) -> int:
+        return next((i for i, needle in enumerate(needles) if needle in branch.lower()), len(needles))
+
+    best: Optional[BranchChoice] = None
+    for branch in sorted(matrix.branches, key=lambda b: (preference(b), b)):
+        rows = set(matrix.available_at(branch))
+        covered = [label for label, volume_rows in volumes.items() if rows.intersection(volume_rows)]
+        if covered and (best is None or len(covered) > len(best.volumes)):
+            missing = [label for label in volumes if label not in covered]
+            best = BranchChoice(branch=branch, volumes=covered, missing=missing)
+    return best
@@ -0,0 +1,112 @@
+"""Local SQLite store for catalog data that rarely changes.
+
+One table of JSON values, partitioned by namespace ("pnx", ...), each entry
+stamped with when it was stored and last used. Freshness is decided by the
+caller (see `DEFAULT_CACHE_TTLS` and `OmnisClient`), which lets a single entry
+be "fresh", "stale but usable while we refresh it" or "expired" depending on
+age, and lets the store evict least-recently-used entries once it grows past
+`max_entries`.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+DAY = 24 * 60 * 60
+
+DEFAULT_CACHE_TTLS: Dict[str, float] = {
+    # Bibliographic PNX data (ISBNs, publisher, subjects): fresh for a week, and still
+    # served for up to a year while a background refresh fetches the current version.
+    "pnx": 7 * DAY,
+    "pnx_stale": 365 * DAY,
+    # OpenLibrary covers per ISBN. "No cover" answers are cached separately and for less
+    # time, since a cover may still be uploaded later.
+    "cover": 30 * DAY,
+    "cover_miss": 7 * DAY,
+    # Edition docs per FRBR group (work), so repeat searches only re-check availability.
+    # Editions do get added, so groups are re-expanded weekly.
+    "frbr_group": 7 * DAY,
+    # Branch name -> library code, for pushing --branch filters into the search.
+    "library_codes": 30 * DAY,
+    # Record -> getPhysicalService id is effectively static; lookups that failed are
+    # retried soon after.
+    "physical_service": 90 * DAY,
+    "physical_service_miss": 10 * 60,
+    # Per-holding due dates change whenever an item is returned, so only bridge
+    # back-to-back searches (e.g. one --branch after another).
+    "holding": 10 * 60,
+    "holding_miss": 2 * 60,
+}
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    age: float
+
+
+class CacheStore:
+    # How many writes to allow between checks of the size bound.
+    _EVICT_EVERY = 64
+
+    def __init__(self, path: Union[str, Path] = ":memory:", max_entries: int = 50_000):
+        """`path` defaults to an in-memory database (cache for this process only).
+
+        The size bound is enforced every few dozen writes, so it may briefly overshoot.
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(str(path), isolation_level=None)
+        if path != ":memory:":
+            # Lets a second omnis-cli run read the cache while another is writing it.
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " used_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+        self._writes = 0
+        self._evict()
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        row = self._db.execute(
+            "SELECT value, stored_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        self._db.execute("UPDATE entries SET used_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return CacheEntry(json.loads(row[0]), now - row[1])
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, stored_at, used_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        self._writes += 1
+        if self._writes % self._EVICT_EVERY == 0:
+            self._evict()
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _evict(self) -> None:
+        excess = self.count() - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY used_at LIMIT ?)", (excess,)
+            )
+
+    def close(self) -> None:
+        self._db.close()
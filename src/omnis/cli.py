@@ -1,5 +1,7 @@
 import argparse
 import asyncio
+import importlib.util
+import re
 import sys
 from pathlib import Path
 from typing import List, Dict, Any, Optional
@@ -12,16 +14,48 @@ from rich.console import Console
 from rich.table import Table
 from rich.prompt import Prompt, IntPrompt, Confirm
 from rich.panel import Panel
+from rich.console import Group
+from rich.live import Live
+from rich.spinner import Spinner
 from rich import print as rprint
 
 import httpx
 
-from omnis.client import OmnisClient, UserInfo, Loan, BookDetails, SearchResult, Fine, RequestItem
+from omnis.client import (
+    UserInfo,
+    Loan,
+    BookDetails,
+    BulkSearchResult,
+    SearchResult,
+    SearchDepth,
+    Fine,
+    RequestItem,
+)
 from omnis.tenants import KNOWN_TENANTS
+from omnis.availability import availability_matrix, best_branch
 from omnis.branches import fetch_branches, BranchInfo
+from omnis.cache import CacheStore
+from omnis.history import LoanHistoryStore
+from omnis.pool import OmnisClientPool
+from omnis.sessions import SessionStore
 
 CONFIG_DIR = Path.home() / ".config" / "omnis-py"
 CONFIG_FILE = CONFIG_DIR / "config.yaml"
+CACHE_DIR = Path.home() / ".cache" / "omnis-py"
+SESSIONS_FILE = CACHE_DIR / "sessions.json"
+CACHE_DB_FILE = CACHE_DIR / "cache.sqlite3"
+HISTORY_DB_FILE = CACHE_DIR / "history.sqlite3"
+# A --search-file line that is an ISBN-10 or ISBN-13 (hyphens and spaces removed).
+ISBN_LINE_RE = re.compile(r"\d{9}[\dXx]|97[89]\d{10}")
+# Loans per get_record_details_many call while loan pages are still streaming in.
+DETAILS_BATCH_SIZE = 20
+
+SEARCH_DEPTHS = {
+    "top": SearchDepth.TOP_LEVEL,
+    "versions": SearchDepth.VERSIONS,
+    "delivery": SearchDepth.DELIVERY,
+    "due-dates": SearchDepth.DUE_DATES,
+}
 
 console = Console()
 
@@ -126,29 +160,49 @@ def add_account_wizard() -> Dict[str, str]:
     }
 
 
-async def fetch_account_data(account: Dict[str, str], details: bool = False, history: bool = False) -> Dict[str, Any]:
-    client = OmnisClient(account["base_url"])
+async def fetch_account_data(
+    account: Dict[str, str],
+    pool: OmnisClientPool,
+    details: bool = False,
+    history: bool = False,
+) -> Dict[str, Any]:
+    client = pool.session(account["base_url"])
     try:
         await client.login(account["username"], account["password"], account["institution"], account["view"])
         user_info = await client.get_user_info()
-        loans = await client.get_loans(loan_type="history" if history else "active")
+        loan_type = "history" if history else "active"
 
-        loans_with_details: List[Dict[str, Any]] = []
+        loans: List[Loan] = []
+        details_by_mmsid: Dict[str, BookDetails] = {}
         if details:
-            # Fetch details for each loan concurrently
-            detail_tasks = [client.get_record_details(loan.mmsid) for loan in loans]
-            detailed_results = await asyncio.gather(*detail_tasks, return_exceptions=True)
-
-            for loan, detail_result in zip(loans, detailed_results):
-                if isinstance(detail_result, Exception):
-                    # Handle cases where detail fetching fails for a specific book
-                    console.print(f"[dim red]Could not fetch details for '{loan.title}': {detail_result}[/dim]")
-                    loans_with_details.append({"loan": loan, "details": None})
-                else:
-                    loans_with_details.append({"loan": loan, "details": detail_result})
+            # Records are fetched in batches (covers included, also batched), not one
+            # request per loan, and each batch starts as soon as its loans have arrived,
+            # while later loan pages are still loading.
+            detail_batches: List["asyncio.Task[Dict[str, BookDetails]]"] = []
+            try:
+                async for loan in client.iter_loans(loan_type=loan_type):
+                    loans.append(loan)
+                    if len(loans) % DETAILS_BATCH_SIZE == 0:
+                        batch = [loan.mmsid for loan in loans[-DETAILS_BATCH_SIZE:]]
+                        detail_batches.append(asyncio.create_task(client.get_record_details_many(batch)))
+                if len(loans) % DETAILS_BATCH_SIZE:
+                    batch = [loan.mmsid for loan in loans[-(len(loans) % DETAILS_BATCH_SIZE) :]]
+                    detail_batches.append(asyncio.create_task(client.get_record_details_many(batch)))
+                for found in await asyncio.gather(*detail_batches):
+                    details_by_mmsid.update(found)
+            finally:
+                for task in detail_batches:
+                    task.cancel()
         else:
-            # If not fetching details, just wrap the loan object
-            loans_with_details = [{"loan": loan, "details": None} for loan in loans]
+            loans = await client.get_loans(loan_type=loan_type)
+
+        loans_with_details: List[Dict[str, Any]] = []
+        for loan in loans:
+            detail_result = details_by_mmsid.get(loan.mmsid) if details else None
+            if details and detail_result is None:
+                # Handle cases where detail fetching fails for a specific book
+                console.print(f"[dim red]Could not fetch details for '{loan.title}'[/dim]")
+            loans_with_details.append({"loan": loan, "details": detail_result})
 
         return {
             "account": _redact_account(account),
@@ -289,107 +343,269 @@ def display_results_table(
 
 async def run_search(
     account: Dict[str, str],
+    pool: OmnisClientPool,
     query: str,
-    branch_filter: Optional[str] = None,
+    branch_filter: Optional[List[str]] = None,
     show_address: bool = False,
     verbose: bool = False,
+    depth: SearchDepth = SearchDepth.DUE_DATES,
+    max_requests: Optional[int] = None,
+    deadline: Optional[float] = None,
+    compare_branches: bool = False,
+    max_pages: int = 1,
+    stop_after: Optional[int] = None,
+    available_only: bool = False,
 ):
-    client = OmnisClient(account["base_url"])
+    client = pool.session(account["base_url"])
     try:
         await client.login(account["username"], account["password"], account["institution"], account["view"])
-        with console.status(f"[bold green]Searching for '{query}'...[/bold green]", spinner="dots"):
-            results = await client.search_books(query, branch_filter=branch_filter)
-        display_search_results(results, query, branch_filter, show_address, verbose)
+        results: Dict[int, SearchResult] = {}
+        # Works still waiting for due dates stay in the live area (redrawn as dates arrive);
+        # finished ones are printed above it for good, in the order they complete, each
+        # labelled with its catalog rank since that order isn't the relevance order.
+        in_progress: Dict[int, SearchResult] = {}
+        spinner = Spinner("dots", text=f"[bold green]Searching for '{query}'...[/bold green]")
+        with Live(spinner, console=console, transient=True) as live:
+            async for update in client.iter_search_books(
+                query,
+                branch_filter=branch_filter,
+                depth=depth,
+                max_requests=max_requests,
+                deadline=deadline,
+                max_pages=max_pages,
+                stop_after=stop_after,
+                available_only=available_only,
+            ):
+                results[update.rank] = update.result
+                if update.done:
+                    in_progress.pop(update.rank, None)
+                    for renderable in render_search_result(update.result, show_address, verbose, update.rank):
+                        live.console.print(renderable)
+                else:
+                    in_progress[update.rank] = update.result
+                pending_tables = [
+                    render_search_result(in_progress[rank], show_address, rank=rank)[0] for rank in sorted(in_progress)
+                ]
+                live.update(Group(*pending_tables, spinner))
+        if not results:
+            display_search_results([], query, branch_filter)
+        elif compare_branches:
+            display_branch_comparison([results[rank] for rank in sorted(results)], branch_filter or [])
     except Exception as e:
         console.print(f"[bold red]Search error:[/bold red] {e}")
     finally:
         await client.close()
 
 
+async def run_isbn_lookup(
+    account: Dict[str, str],
+    pool: OmnisClientPool,
+    isbns: List[str],
+    branch_filter: Optional[List[str]] = None,
+    show_address: bool = False,
+    verbose: bool = False,
+):
+    client = pool.session(account["base_url"])
+    try:
+        await client.login(account["username"], account["password"], account["institution"], account["view"])
+        with console.status("[bold green]Looking up ISBNs...[/bold green]", spinner="dots"):
+            found = await client.lookup_identifiers(isbns, branch_filter=branch_filter)
+        for isbn, versions in found.items():
+            if not versions:
+                console.print(f"[italic]No match for ISBN {isbn}.[/italic]")
+                continue
+            result = SearchResult(title=f"{versions[0].title} [dim](ISBN {isbn})[/dim]", versions=versions)
+            for renderable in render_search_result(result, show_address, verbose):
+                console.print(renderable)
+    except Exception as e:
+        console.print(f"[bold red]Search error:[/bold red] {e}")
+    finally:
+        await client.close()
+
+
+async def run_search_file(account: Dict[str, str], pool: OmnisClientPool, path: str, **search_options: Any):
+    """Search every line of `path` ("-" for stdin) over one session, printing one JSON object per query.
+
+    ISBN lines are looked up by identifier (all of them in a few batched searches)
+    rather than searched as free text; every other line goes through `search_many`.
+    """
+    if path == "-":
+        queries = [line.strip() for line in sys.stdin]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f]
+    queries = [q for q in queries if q]
+    is_isbn = [bool(ISBN_LINE_RE.fullmatch(q.replace("-", "").replace(" ", ""))) for q in queries]
+    isbns = [q for q, isbn in zip(queries, is_isbn) if isbn]
+    texts = [q for q, isbn in zip(queries, is_isbn) if not isbn]
+
+    def emit(outcome: BulkSearchResult) -> None:
+        sys.stdout.write(outcome.model_dump_json() + "\n")
+        sys.stdout.flush()
+
+    client = pool.session(account["base_url"])
+    try:
+        await client.login(account["username"], account["password"], account["institution"], account["view"])
+        if isbns:
+            try:
+                found = await client.lookup_identifiers(isbns, branch_filter=search_options.get("branch_filter"))
+            except (httpx.HTTPError, ValueError) as e:
+                for isbn in isbns:
+                    emit(BulkSearchResult(query=isbn, error=str(e) or type(e).__name__))
+            else:
+                for isbn in isbns:
+                    versions = found.get(isbn, [])
+                    if search_options.get("available_only"):
+                        versions = [v for v in versions if any(b.status == "available" for b in v.branches)]
+                    results = (
+                        [SearchResult(title=versions[0].title, author=versions[0].author, versions=versions)]
+                        if versions
+                        else []
+                    )
+                    emit(BulkSearchResult(query=isbn, results=results))
+        async for outcome in client.search_many(texts, **search_options):
+            emit(outcome)
+    except Exception as e:
+        # stdout carries the NDJSON stream only.
+        Console(stderr=True).print(f"[bold red]Search error:[/bold red] {e}")
+    finally:
+        await client.close()
+
+
+def render_search_result(
+    result: SearchResult, show_address: bool = False, verbose: bool = False, rank: Optional[int] = None
+) -> List[Any]:
+    """Rich renderables for one work: its availability table, plus per-edition detail panels if verbose.
+
+    `rank` (0-based position in the catalog's ranking) is shown as "#n" when given.
+    """
+    title_line = f"📖 {result.title}" if rank is None else f"[dim]#{rank + 1}[/dim] 📖 {result.title}"
+    if result.author:
+        title_line += f" — {result.author}"
+    series = next((v.series for v in result.versions if v.series), None)
+    if series:
+        title_line += f"\n[dim]{series}[/dim]"
+    if not result.complete:
+        title_line += "\n[dim](incomplete — search budget ran out)[/dim]"
+
+    table = Table(title=title_line, show_header=True, header_style="bold")
+    table.add_column("Edition", style="dim")
+    table.add_column("Year", justify="center")
+    table.add_column("Branch", style="magenta")
+    if show_address:
+        table.add_column("Address", style="cyan")
+    table.add_column("Status")
+
+    for version in result.versions:
+        edition_label = version.edition or "-"
+        year = version.publication_date or "-"
+
+        if not version.branches:
+            row = [edition_label, year, "[dim]no data[/dim]"]
+            if show_address:
+                row.append("")
+            row.append("")
+            table.add_row(*row)
+            continue
+
+        for branch in version.branches:
+            if branch.status == "available":
+                status_display = "[green]Available[/green]"
+            elif branch.due_date:
+                if branch.overdue:
+                    status_display = f"[red]Overdue since {branch.due_date}[/red]"
+                else:
+                    status_display = f"[yellow]Borrowed until {branch.due_date}[/yellow]"
+            else:
+                status_display = "[yellow]Borrowed[/yellow]"
+
+            row = [edition_label, year, branch.library_name]
+            if show_address:
+                address_display = branch.sub_location or "-"
+                if branch.maps_url:
+                    address_display = f"{address_display}\n[blue]{branch.maps_url}[/blue]"
+                row.append(address_display)
+            row.append(status_display)
+            table.add_row(*row)
+
+    renderables: List[Any] = [table]
+
+    if verbose:
+        for version in result.versions:
+            details = []
+            if version.isbns:
+                details.append(f"[bold]ISBN:[/bold] {', '.join(version.isbns)}")
+            if version.language:
+                details.append(f"[bold]Language:[/bold] {version.language}")
+            if version.physical_description:
+                details.append(f"[bold]Physical:[/bold] {version.physical_description}")
+            if version.genres:
+                details.append(f"[bold]Genre:[/bold] {', '.join(version.genres)}")
+            if version.subjects:
+                details.append(f"[bold]Subject:[/bold] {', '.join(version.subjects)}")
+            if details:
+                panel_title = version.edition or version.publication_date or version.mmsid
+                renderables.append(Panel("\n".join(details), title=f"ℹ️  {panel_title}", title_align="left"))
+
+    renderables.append("")
+    return renderables
+
+
 def display_search_results(
     results: List[SearchResult],
     query: str,
-    branch_filter: Optional[str] = None,
+    branch_filter: Optional[List[str]] = None,
     show_address: bool = False,
     verbose: bool = False,
 ):
     if not results:
-        suffix = f" (branch: {branch_filter})" if branch_filter else ""
+        suffix = f" (branch: {', '.join(branch_filter)})" if branch_filter else ""
         console.print(f"[italic]No results for '{query}'{suffix}.[/italic]")
         return
 
     for result in results:
-        title_line = f"📖 {result.title}"
-        if result.author:
-            title_line += f" — {result.author}"
-        series = next((v.series for v in result.versions if v.series), None)
-        if series:
-            title_line += f"\n[dim]{series}[/dim]"
-
-        table = Table(title=title_line, show_header=True, header_style="bold")
-        table.add_column("Edition", style="dim")
-        table.add_column("Year", justify="center")
-        table.add_column("Branch", style="magenta")
-        if show_address:
-            table.add_column("Address", style="cyan")
-        table.add_column("Status")
-
-        for version in result.versions:
-            edition_label = version.edition or "-"
-            year = version.publication_date or "-"
-
-            if not version.branches:
-                row = [edition_label, year, "[dim]no data[/dim]"]
-                if show_address:
-                    row.append("")
-                row.append("")
-                table.add_row(*row)
-                continue
+        for renderable in render_search_result(result, show_address, verbose):
+            console.print(renderable)
 
-            for branch in version.branches:
-                if branch.status == "available":
-                    status_display = "[green]Available[/green]"
-                elif branch.due_date:
-                    if branch.overdue:
-                        status_display = f"[red]Overdue since {branch.due_date}[/red]"
-                    else:
-                        status_display = f"[yellow]Borrowed until {branch.due_date}[/yellow]"
-                else:
-                    status_display = "[yellow]Borrowed[/yellow]"
-
-                row = [edition_label, year, branch.library_name]
-                if show_address:
-                    address_display = branch.sub_location or "-"
-                    if branch.maps_url:
-                        address_display = f"{address_display}\n[blue]{branch.maps_url}[/blue]"
-                    row.append(address_display)
-                row.append(status_display)
-                table.add_row(*row)
 
-        console.print(table)
+def display_branch_comparison(results: List[SearchResult], preferred: List[str]):
+    """Branch × work table for a multi-branch search, plus the branch with the most works on the shelf."""
+    matrix = availability_matrix(results)
+    if not matrix.branches:
+        return
 
-        if verbose:
-            for version in result.versions:
-                details = []
-                if version.isbns:
-                    details.append(f"[bold]ISBN:[/bold] {', '.join(version.isbns)}")
-                if version.language:
-                    details.append(f"[bold]Language:[/bold] {version.language}")
-                if version.physical_description:
-                    details.append(f"[bold]Physical:[/bold] {version.physical_description}")
-                if version.genres:
-                    details.append(f"[bold]Genre:[/bold] {', '.join(version.genres)}")
-                if version.subjects:
-                    details.append(f"[bold]Subject:[/bold] {', '.join(version.subjects)}")
-                if details:
-                    panel_title = version.edition or version.publication_date or version.mmsid
-                    console.print(Panel("\n".join(details), title=f"ℹ️  {panel_title}", title_align="left"))
+    table = Table(title="Availability by branch", show_header=True, header_style="bold")
+    table.add_column("Branch", style="magenta")
+    for work in matrix.works:
+        table.add_column(work, justify="center")
+
+    for branch in sorted(matrix.branches, key=lambda b: (-len(matrix.available_at(b)), b)):
+        row = [branch]
+        for cells in matrix.cells:
+            copy = cells.get(branch)
+            if copy is None:
+                row.append("[dim]-[/dim]")
+            elif copy.status == "available":
+                row.append("[green]✓[/green]")
+            elif copy.due_date:
+                row.append(f"[yellow]{copy.due_date}[/yellow]")
+            else:
+                row.append("[yellow]✗[/yellow]")
+        table.add_row(*row)
+    console.print(table)
 
-        console.print()
+    choice = best_branch(matrix, preferred=preferred)
+    if choice is None:
+        console.print("[italic]None of these works is on the shelf in any of these branches.[/italic]")
+        return
+    line = f"[bold]Best branch:[/bold] {choice.branch} — {len(choice.volumes)}/{len(matrix.works)} available"
+    if choice.missing:
+        line += f" (missing: {', '.join(choice.missing)})"
+    console.print(line)
 
 
-async def fetch_account_fines(account: Dict[str, str]) -> Dict[str, Any]:
-    client = OmnisClient(account["base_url"])
+async def fetch_account_fines(account: Dict[str, str], pool: OmnisClientPool) -> Dict[str, Any]:
+    client = pool.session(account["base_url"])
     try:
         await client.login(account["username"], account["password"], account["institution"], account["view"])
         fines = await client.get_fines()
@@ -400,9 +616,9 @@ async def fetch_account_fines(account: Dict[str, str]) -> Dict[str, Any]:
         await client.close()
 
 
-async def run_fines(accounts: List[Dict[str, str]], output_format: str = "table"):
+async def run_fines(accounts: List[Dict[str, str]], pool: OmnisClientPool, output_format: str = "table"):
     with console.status("[bold green]Fetching fines...[/bold green]", spinner="dots"):
-        results = await asyncio.gather(*(fetch_account_fines(acc) for acc in accounts))
+        results = await asyncio.gather(*(fetch_account_fines(acc, pool) for acc in accounts))
 
     if output_format == "json":
         display_fines_json(results)
@@ -499,8 +715,8 @@ def display_fines_csv(results: List[Dict[str, Any]]):
             )
 
 
-async def fetch_account_requests(account: Dict[str, str]) -> Dict[str, Any]:
-    client = OmnisClient(account["base_url"])
+async def fetch_account_requests(account: Dict[str, str], pool: OmnisClientPool) -> Dict[str, Any]:
+    client = pool.session(account["base_url"])
     try:
         await client.login(account["username"], account["password"], account["institution"], account["view"])
         requests = await client.get_requests()
@@ -511,9 +727,9 @@ async def fetch_account_requests(account: Dict[str, str]) -> Dict[str, Any]:
         await client.close()
 
 
-async def run_requests(accounts: List[Dict[str, str]], output_format: str = "table"):
+async def run_requests(accounts: List[Dict[str, str]], pool: OmnisClientPool, output_format: str = "table"):
     with console.status("[bold green]Fetching holds/requests...[/bold green]", spinner="dots"):
-        results = await asyncio.gather(*(fetch_account_requests(acc) for acc in accounts))
+        results = await asyncio.gather(*(fetch_account_requests(acc, pool) for acc in accounts))
 
     if output_format == "json":
         display_requests_json(results)
@@ -571,7 +787,7 @@ def display_requests_csv(results: List[Dict[str, Any]]):
             writer.writerow([res["account"]["username"], item.category, json.dumps(item.raw, ensure_ascii=False)])
 
 
-async def run_branches(branch_filter: Optional[str] = None):
+async def run_branches(branch_filter: Optional[List[str]] = None):
     async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
         try:
             with console.status("[bold green]Fetching branch directory...[/bold green]", spinner="dots"):
@@ -581,15 +797,15 @@ async def run_branches(branch_filter: Optional[str] = None):
             return
 
     if branch_filter:
-        needle = branch_filter.lower()
-        branches = [b for b in branches if needle in b.name.lower()]
+        needles = [b.lower() for b in branch_filter]
+        branches = [b for b in branches if any(needle in b.name.lower() for needle in needles)]
 
     display_branches(branches, branch_filter)
 
 
-def display_branches(branches: List[BranchInfo], branch_filter: Optional[str] = None):
+def display_branches(branches: List[BranchInfo], branch_filter: Optional[List[str]] = None):
     if not branches:
-        suffix = f" matching '{branch_filter}'" if branch_filter else ""
+        suffix = f" matching '{', '.join(branch_filter)}'" if branch_filter else ""
         console.print(f"[italic]No branches found{suffix}.[/italic]")
         return
 
@@ -692,7 +908,47 @@ async def async_main():
     parser.add_argument("--history", action="store_true", help="Show loan history instead of active loans")
     parser.add_argument("--search", metavar="QUERY", help="Search the catalog by title/keyword")
     parser.add_argument(
-        "--branch", metavar="NAME", help="Filter --search/--branches results to names containing this text"
+        "--isbn",
+        action="append",
+        metavar="ISBN",
+        help="Look up editions by ISBN (10 or 13 digits) with per-branch availability; repeatable",
+    )
+    parser.add_argument(
+        "--search-file",
+        metavar="PATH",
+        help="Search for every line of PATH ('-' for stdin) in one session, printing one JSON line per query; "
+        "ISBN lines are looked up as with --isbn",
+    )
+    parser.add_argument(
+        "--branch",
+        metavar="NAME",
+        action="append",
+        help="Filter --search/--branches results to names containing this text; repeat for several branches. "
+        "With more than one (or 'all'), --search also compares the branches and picks the best one",
+    )
+    parser.add_argument(
+        "--depth",
+        choices=list(SEARCH_DEPTHS),
+        default="due-dates",
+        help="How far --search follows each work: top-level hits only, all editions, per-branch availability, "
+        "or also due dates of borrowed copies (default: due-dates)",
+    )
+    parser.add_argument(
+        "--pages", type=int, default=1, metavar="N", help="Read up to N pages of 10 works for --search (default: 1)"
+    )
+    parser.add_argument(
+        "--stop-after", type=int, metavar="N", help="Stop reading further --search pages once N works have matched"
+    )
+    parser.add_argument(
+        "--available",
+        action="store_true",
+        help="Only show --search works with a copy on the shelf (in the --branch branches, if given)",
+    )
+    parser.add_argument(
+        "--max-requests", type=int, metavar="N", help="Stop --search after N HTTP requests, showing what's known"
+    )
+    parser.add_argument(
+        "--deadline", type=float, metavar="SECONDS", help="Stop --search after SECONDS, showing what's known"
     )
     parser.add_argument(
         "--address",
@@ -711,33 +967,113 @@ async def async_main():
         help="Show active holds/requests for all configured accounts "
         "(raw per-item data — shape not fully verified yet, see docs/plans/account-actions-api.md)",
     )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Multiplex requests to each library over HTTP/2 (requires: pip install omnis-py[http2])",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse login sessions and cache catalog data (book details, covers, physical service ids, "
+        f"recent due dates) between runs, and sync --history incrementally (stored in {CACHE_DIR})",
+    )
     args = parser.parse_args()
 
+    # "all" means every branch: no filtering, but still a branch comparison for --search.
+    wants_all = any(b.lower() == "all" for b in args.branch or [])
+    args.compare_branches = wants_all or len(args.branch or []) > 1
+    if wants_all:
+        args.branch = None
+
     if args.branches:
         await run_branches(args.branch)
         return
 
+    if args.http2 and importlib.util.find_spec("h2") is None:
+        # httpx only needs h2 once the first connection is made, and would fail there with a traceback.
+        Console(stderr=True).print(
+            "[yellow]--http2 needs the optional h2 package (pip install omnis-py\\[http2]); using HTTP/1.1[/yellow]"
+        )
+        args.http2 = False
+
+    session_store = SessionStore(SESSIONS_FILE) if args.cache else None
+    cache = CacheStore(CACHE_DB_FILE) if args.cache else None
+    history_store = LoanHistoryStore(HISTORY_DB_FILE) if args.cache else None
+    try:
+        # One pool for the whole run, so every account on the same library reuses its connections.
+        async with OmnisClientPool(
+            http2=args.http2, session_store=session_store, cache=cache, history_store=history_store
+        ) as pool:
+            await run_accounts(args, pool)
+    finally:
+        if cache:
+            cache.close()
+        if history_store:
+            history_store.close()
+
+
+async def run_accounts(args: argparse.Namespace, pool: OmnisClientPool):
     accounts = load_config()
 
     if args.fines:
         if not accounts:
             rprint("[red]No accounts configured. Add one first with --add.[/red]")
             return
-        await run_fines(accounts, args.format)
+        await run_fines(accounts, pool, args.format)
         return
 
     if args.requests:
         if not accounts:
             rprint("[red]No accounts configured. Add one first with --add.[/red]")
             return
-        await run_requests(accounts, args.format)
+        await run_requests(accounts, pool, args.format)
+        return
+
+    if args.isbn:
+        if not accounts:
+            rprint("[red]No accounts configured. Add one first with --add.[/red]")
+            return
+        await run_isbn_lookup(accounts[0], pool, args.isbn, args.branch, args.address, args.verbose)
+        return
+
+    if args.search_file:
+        if not accounts:
+            rprint("[red]No accounts configured. Add one first with --add.[/red]")
+            return
+        await run_search_file(
+            accounts[0],
+            pool,
+            args.search_file,
+            branch_filter=args.branch,
+            depth=SEARCH_DEPTHS[args.depth],
+            max_requests=args.max_requests,
+            deadline=args.deadline,
+            max_pages=args.pages,
+            stop_after=args.stop_after,
+            available_only=args.available,
+        )
         return
 
     if args.search:
         if not accounts:
             rprint("[red]No accounts configured. Add one first with --add.[/red]")
             return
-        await run_search(accounts[0], args.search, args.branch, args.address, args.verbose)
+        await run_search(
+            accounts[0],
+            pool,
+            args.search,
+            args.branch,
+            args.address,
+            args.verbose,
+            SEARCH_DEPTHS[args.depth],
+            args.max_requests,
+            args.deadline,
+            args.compare_branches,
+            args.pages,
+            args.stop_after,
+            args.available,
+        )
         return
 
     if args.add or not accounts:
@@ -763,11 +1099,9 @@ async def async_main():
     if args.renew and not args.history:
         rprint("\n[bold green]Attempting to renew renewable loans for all accounts...[/bold green]")
         for account in accounts:
-            client = OmnisClient(account["base_url"])
+            client = pool.session(account["base_url"])
             try:
-                await client.login(
-                    account["username"], account["password"], account.get("institution"), account.get("view")
-                )
+                await client.login(account["username"], account["password"], account["institution"], account["view"])
             except Exception as e:
                 console.print(f"[red]Login failed for {account.get('username')}: {e}[/red]")
                 try:
@@ -810,7 +1144,7 @@ async def async_main():
     with console.status(
         f"[bold green]Fetching library {'history' if args.history else 'data'}...[/bold green]", spinner="dots"
     ):
-        tasks = [fetch_account_data(acc, fetch_details, args.history) for acc in accounts]
+        tasks = [fetch_account_data(acc, pool, fetch_details, args.history) for acc in accounts]
         results = await asyncio.gather(*tasks)
 
     if args.format == "table":
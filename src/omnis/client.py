@@ -1,8 +1,43 @@
 import asyncio
+import base64
+import contextvars
+import json
+import math
 import re
+import time
+from collections import Counter, deque
+from contextlib import aclosing
+from enum import IntEnum
 import httpx
-from typing import Any, Dict, List, Optional, Tuple
-from pydantic import BaseModel, Field
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from pydantic import AliasChoices, BaseModel, Field, field_validator
+
+try:
+    import orjson
+except ImportError:  # Optional speedup: pip install omnis-py[orjson]
+    orjson = None  # type: ignore[assignment]
+
+from .cache import DEFAULT_CACHE_TTLS, CacheStore
+from .history import LoanHistoryStore
+from .retry import LatencyTracker, RetryPolicy
+from .scheduler import HostScheduler, Priority
+from .sessions import SessionStore, StoredSession
 
 
 class Loan(BaseModel):
@@ -18,12 +53,21 @@ class Loan(BaseModel):
     location_name: str = Field(alias="mainlocationname")
     sub_location_name: Optional[str] = Field(None, alias="secondarylocationname")
     barcode: str = Field(alias="itembarcode")
-    renewable: bool = False
+    # The API's "renew" flag ("Y"/"N"); `renewable` is still accepted by name.
+    renewable: bool = Field(False, validation_alias=AliasChoices("renewable", "renew"))
+
+    @field_validator("renewable", mode="before")
+    @classmethod
+    def _renew_flag(cls, value: Any) -> Any:
+        return value if isinstance(value, bool) else value == "Y"
 
     @classmethod
     def from_api(cls, data: Dict[str, Any]) -> "Loan":
-        data["renewable"] = data.get("renew") == "Y"
-        return cls(**data)
+        """Build a Loan from a raw myaccount/loans record, leaving `data` untouched.
+
+        The record is validated as-is, without copying it into keyword arguments.
+        """
+        return cls.model_validate(data)
 
 
 _FINE_AMOUNT_RE = re.compile(r"([\d,.]+)\s*(\S+)")
@@ -129,6 +173,119 @@ class SearchResult(BaseModel):
     title: str
     author: Optional[str] = None
     versions: List[BookVersion] = []
+    # False when the search's depth budget (max_requests/deadline) ran out before this
+    # work was fully resolved; what's here is correct, but versions/branches/due dates may be missing.
+    complete: bool = True
+
+
+class SearchDepth(IntEnum):
+    """How far `search_books` follows each work; every level adds requests on top of the previous."""
+
+    TOP_LEVEL = 0  # just the ranked works from one search request
+    VERSIONS = 1  # + one search per work for all its editions
+    DELIVERY = 2  # + per-branch availability (one delivery call per work)
+    DUE_DATES = 3  # + due dates for borrowed copies (physical service + holdings calls)
+
+
+class SearchBudgetExceeded(Exception):
+    """Raised when a search's `max_requests`/`deadline` runs out before anything could be returned."""
+
+
+class SearchUpdate(BaseModel):
+    """One step of a streamed search (see `OmnisClient.iter_search_books`)."""
+
+    kind: str  # "result" or "due_dates"
+    rank: int
+    result: SearchResult
+    done: bool = False
+
+
+class BulkSearchResult(BaseModel):
+    """Outcome of one query of `OmnisClient.search_many`; `error` is set instead of results if it failed."""
+
+    query: str
+    results: List[SearchResult] = []
+    error: Optional[str] = None
+
+
+T = TypeVar("T")
+
+
+class _RequestBudget:
+    def __init__(self, max_requests: Optional[int]):
+        self.max_requests = max_requests
+        self.used = 0
+
+    def check(self) -> None:
+        if self.max_requests is not None and self.used >= self.max_requests:
+            raise SearchBudgetExceeded(f"Request budget of {self.max_requests} exhausted")
+
+    def spend(self) -> None:
+        self.check()
+        self.used += 1
+
+
+# Set only inside the tasks of a budgeted search, so every HTTP request they send counts
+# against it (retries and hedges included) while cache hits stay free.
+_request_budget: contextvars.ContextVar[Optional[_RequestBudget]] = contextvars.ContextVar(
+    "omnis_request_budget", default=None
+)
+
+# Set only inside the tasks of a `search_many` batch on a client without a cache, so
+# the queries share lookups without the client's own (shared) state being touched.
+_batch_cache: contextvars.ContextVar[Optional[CacheStore]] = contextvars.ContextVar("omnis_batch_cache", default=None)
+
+_DUE_DATE_RE = re.compile(r"(\d{2}/\d{2}/\d{4})")
+
+OPENLIBRARY_COVER_URL = "https://covers.openlibrary.org/b/isbn/{isbn}-M.jpg"
+
+# Decodes Primo response bodies; orjson roughly halves the cost on large PNX searches.
+default_json_loads: Callable[[bytes], Any] = orjson.loads if orjson is not None else json.loads
+
+_ISBN_RE = re.compile(r"[\dXx-]+")
+# Well-formed after hyphens are dropped: X only as the ISBN-10 check digit.
+_ISBN10_RE = re.compile(r"\d{9}[\dX]")
+_ISBN13_RE = re.compile(r"978\d{10}")
+
+_MMSID_RE = re.compile(r"(?:alma)?(\d+)")
+
+# Search field and precision per identifier kind accepted by `lookup_identifiers`.
+# There is no exact record-id search field, so MMS ids are searched as free text
+# and every hit is checked against the record's own id before it counts.
+_IDENTIFIER_FIELDS = {"isbn": ("isbn", "exact"), "mmsid": ("any", "contains")}
+
+
+def _isbn_digits(isbn: str) -> str:
+    """The leading ISBN-like part of `isbn`, without hyphens or any trailing qualifier."""
+    match = _ISBN_RE.match(isbn.strip())
+    return match.group().replace("-", "").upper() if match else ""
+
+
+def _isbn_variants(isbn: str) -> Set[str]:
+    """An ISBN with hyphens dropped, in both its ISBN-10 and ISBN-13 form where both exist.
+
+    Catalog records often carry only one form (sometimes followed by a qualifier such
+    as "(oprawa)"), while reading lists use either. Malformed input (e.g. an X that
+    isn't an ISBN-10 check digit) comes back as-is, without a second form.
+    """
+    digits = _isbn_digits(isbn)
+    variants = {digits} if digits else set()
+    if _ISBN10_RE.fullmatch(digits):
+        core = "978" + digits[:9]
+        check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(core)) % 10) % 10
+        variants.add(f"{core}{check}")
+    elif _ISBN13_RE.fullmatch(digits):
+        core = digits[3:12]
+        check = (11 - sum(int(d) * (10 - i) for i, d in enumerate(core)) % 11) % 11
+        variants.add(core + ("X" if check == 10 else str(check)))
+    return variants
+
+
+def _decode_jwt_payload(token: str) -> Dict[str, Any]:
+    _, payload_b64, _ = token.split(".")
+    # Add padding if needed
+    payload_b64 += "=" * ((4 - len(payload_b64) % 4) % 4)
+    return json.loads(base64.b64decode(payload_b64).decode("utf-8"))
 
 
 class OmnisClient:
@@ -136,7 +293,39 @@ class OmnisClient:
         self,
         base_url: str = "https://omnis-br.primo.exlibrisgroup.com",
         client: Optional[httpx.AsyncClient] = None,
+        session_store: Optional[SessionStore] = None,
+        scheduler: Optional[HostScheduler] = None,
+        max_concurrency_per_host: int = 6,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedge_percentile: Optional[float] = None,
+        cache: Optional[CacheStore] = None,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        cover_url_template: str = OPENLIBRARY_COVER_URL,
+        history_store: Optional[LoanHistoryStore] = None,
+        json_loads: Optional[Callable[[bytes], Any]] = None,
     ):
+        """`scheduler` can be shared between clients (see `OmnisClientPool`) so the
+        per-host cap holds across accounts; otherwise each client gets its own,
+        capped at `max_concurrency_per_host` in-flight requests per host.
+
+        Throttled (429) and failed (5xx / connection error) idempotent requests are
+        retried per `retry_policy`. With `hedge_percentile` (e.g. 0.95) set, catalog
+        searches and record fetches that run slower than that percentile of recent
+        calls get a duplicate request, and whichever answers first wins.
+
+        `cache` keeps slow-changing catalog data (PNX records, ...) between calls and,
+        with an on-disk `CacheStore`, between runs; `cache_ttls` overrides entries of
+        `DEFAULT_CACHE_TTLS` (seconds).
+
+        `cover_url_template` (with an `{isbn}` placeholder) points cover lookups at
+        OpenLibrary by default, or at a local stand-in for testing.
+
+        With a `history_store`, loan history is synced into it incrementally and
+        `get_loans(loan_type="history")` is answered from it.
+
+        `json_loads` decodes response bodies (bytes); by default orjson when it is
+        installed, else the standard library.
+        """
         self.base_url = base_url
         if client:
             self.client = client
@@ -149,12 +338,54 @@ class OmnisClient:
         self.user_data: Dict[str, Any] = {}
         self.view: Optional[str] = None
         self.institution: Optional[str] = None
+        self.username: Optional[str] = None
+        # Active loan count from the last get_user_info, used to plan loan paging.
+        self._active_loans_count: Optional[int] = None
+
+        self.session_store = session_store
+        self.scheduler = scheduler or HostScheduler(max_concurrency_per_host)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.latency = LatencyTracker(percentile=hedge_percentile or 0.95)
+        self.hedge = hedge_percentile is not None
+        self.cache = cache
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self._background: Set["asyncio.Task[Any]"] = set()
+        self.cover_url_template = cover_url_template
+        self.history_store = history_store
+        self.json_loads = json_loads or default_json_loads
+        # Whether this tenant accepts several locations per holdings request; None = untried.
+        self._multi_location_holdings: Optional[bool] = None
+        # Whether /pnxs finds records by an OR'ed list of MMS ids here; None = untried.
+        self._pnx_search_by_id: Optional[bool] = None
+        # Branch name (delivery's mainLocation) -> library code, learned from delivery responses.
+        self._library_codes: Optional[Dict[str, str]] = None
+        # Lookups currently running, so concurrent searches wanting the same one share it.
+        self._in_flight: Dict[Tuple[str, ...], Tuple["asyncio.Future[Any]", _RequestBudget]] = {}
+        self._password: Optional[str] = None
+        self._login_lock = asyncio.Lock()
 
     async def login(
         self, username: str, password: str, institution: str = "48OMNIS_BRP", view: str = "48OMNIS_BRP:BRACZ"
     ):
         self.view = view
         self.institution = institution
+        self.username = username
+        # Kept so an expired/revoked session can be replaced transparently (see _request).
+        self._password = password
+
+        if self.session_store:
+            stored = self.session_store.load(self.base_url, institution, username)
+            if stored:
+                for cookie in stored.cookies:
+                    self.client.cookies.set(
+                        cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+                    )
+                self.token = stored.token
+                return stored.token
+
+        return await self._login(username, password, institution, view)
+
+    async def _login(self, username: str, password: str, institution: str, view: str) -> str:
         # Initial request to get cookies
         await self.client.get(f"{self.base_url}/discovery/search", params={"vid": view})
 
@@ -179,41 +410,171 @@ class OmnisClient:
             raise ValueError("Invalid credentials (401)")
         response.raise_for_status()
 
-        result = response.json()
+        result = self._json(response)
         token = result.get("jwtData", "").strip('"')
         if not token:
             raise ValueError("No token received in login response")
 
         self.token = token
+        if self.session_store:
+            self._save_session(token)
         # Basic user info from the same response if available, or we get it later
         return token
 
+    def _save_session(self, token: str) -> None:
+        assert self.session_store and self.institution and self.username
+        try:
+            expires_at = float(_decode_jwt_payload(token)["exp"])
+        except (KeyError, TypeError, ValueError):
+            # Without an `exp` claim there is no safe lifetime to cache it for.
+            return
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+            for c in self.client.cookies.jar
+            if c.value is not None
+        ]
+        self.session_store.save(
+            self.base_url,
+            self.institution,
+            self.username,
+            StoredSession(token=token, expires_at=expires_at, cookies=cookies),
+        )
+
+    async def _relogin(self, rejected_token: Optional[str]) -> None:
+        async with self._login_lock:
+            # Another request may have already replaced the rejected token.
+            if self.token != rejected_token:
+                return
+            assert self.username and self._password and self.institution and self.view
+            if self.session_store:
+                self.session_store.discard(self.base_url, self.institution, self.username)
+            await self._login(self.username, self._password, self.institution, self.view)
+
+    def _json(self, response: httpx.Response) -> Any:
+        return self.json_loads(response.content)
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        auth: bool = True,
+        priority: int = Priority.NORMAL,
+        idempotent: Optional[bool] = None,
+        hedge: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request through the per-host scheduler, attaching the bearer token if we have one.
+
+        `idempotent` defaults to True for GET/HEAD; read-only POSTs (delivery, holdings)
+        pass it explicitly so they get retried too. `hedge` marks calls that may be
+        duplicated when slow (only takes effect if the client has hedging enabled).
+
+        A 401 on an authenticated request means the (possibly restored) session is no
+        longer accepted, so log in again once and replay the request with the new token.
+        """
+        headers: Dict[str, str] = dict(kwargs.pop("headers", None) or {})
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD")
+        hedge = hedge and self.hedge and idempotent
+        sent_token = self.token if auth else None
+        if sent_token:
+            headers["Authorization"] = f"Bearer {sent_token}"
+        response = await self._send_with_retries(method, url, headers, priority, idempotent, hedge, kwargs)
+
+        if response.status_code == 401 and sent_token and self._password:
+            await self._relogin(sent_token)
+            headers["Authorization"] = f"Bearer {self.token}"
+            response = await self._send_with_retries(method, url, headers, priority, idempotent, hedge, kwargs)
+        return response
+
+    async def _send_with_retries(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        priority: int,
+        idempotent: bool,
+        hedge: bool,
+        kwargs: Dict[str, Any],
+    ) -> httpx.Response:
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            try:
+                if hedge:
+                    response = await self._send_hedged(method, url, headers, priority, kwargs)
+                else:
+                    response = await self._send(method, url, headers, priority, kwargs)
+            except httpx.TransportError:
+                if not idempotent or attempt + 1 >= policy.attempts:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if attempt + 1 >= policy.attempts or not policy.should_retry_response(response, idempotent):
+                    return response
+                delay = policy.delay(attempt, response)
+            # Back off outside the scheduler slot, so waiting doesn't block other requests.
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(
+        self, method: str, url: str, headers: Dict[str, str], priority: int, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        budget = _request_budget.get()
+        if budget:
+            budget.spend()
+        async with self.scheduler.slot(httpx.URL(url).host, priority):
+            started = time.monotonic()
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        if response.is_success:
+            self.latency.record(LatencyTracker.key(method, url), time.monotonic() - started)
+        return response
+
+    async def _send_hedged(
+        self, method: str, url: str, headers: Dict[str, str], priority: int, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        threshold = self.latency.threshold(LatencyTracker.key(method, url))
+        if threshold is None:
+            return await self._send(method, url, headers, priority, kwargs)
+
+        attempts = [asyncio.ensure_future(self._send(method, url, headers, priority, kwargs))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=threshold)
+            if not done:
+                attempts.append(asyncio.ensure_future(self._send(method, url, headers, priority, kwargs)))
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every attempt raised; surface the original request's error.
+            return attempts[0].result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
     async def get_user_info(self) -> UserInfo:
         if not self.token:
             raise ValueError("Not logged in")
 
         # Get display name from JWT
-        import json
-        import base64
-
-        _, payload_b64, _ = self.token.split(".")
-        # Add padding if needed
-        payload_b64 += "=" * ((4 - len(payload_b64) % 4) % 4)
-        payload = json.loads(base64.b64decode(payload_b64).decode("utf-8"))
+        payload = _decode_jwt_payload(self.token)
         display_name = payload.get("displayName", "Unknown")
         user_name = payload.get("userName", "")
 
         # Get counters
         counters_url = f"{self.base_url}/primaws/rest/priv/myaccount/counters"
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = await self.client.get(counters_url, params={"lang": "pl"}, headers=headers)
+        response = await self._request("GET", counters_url, params={"lang": "pl"})
         response.raise_for_status()
-        data = response.json().get("data", {})
+        data = self._json(response).get("data", {})
         actions = data.get("listofactions", {}).get("action", [])
 
         counts = {a.get("type"): a.get("value") for a in actions}
 
         loans_count = int(counts.get("Loans", 0))
+        self._active_loans_count = loans_count
         requests_count = int(counts.get("Requests", 0))
         fines_str = counts.get("Fines", "0.00")
 
@@ -226,76 +587,298 @@ class OmnisClient:
             fines_currency="PLN",  # Usually fixed or we could find it elsewhere
         )
 
-    async def get_loans(self, loan_type: str = "active") -> List[Loan]:
+    async def _fetch_loans_page(self, loan_type: str, offset: int, page_size: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """One page of raw loan records, and whether the server says more follow."""
+        params = {
+            "bulk": str(page_size),
+            "lang": "pl",
+            "offset": str(offset),
+            "type": loan_type,
+        }
+        response = await self._request("GET", f"{self.base_url}/primaws/rest/priv/myaccount/loans", params=params)
+        response.raise_for_status()
+        loans_data = self._json(response).get("data", {}).get("loans", {})
+        # showmore is typically a list like ['Y'] or empty/missing if no more
+        showmore = loans_data.get("showmore", [])
+        return loans_data.get("loan", []), bool(showmore) and "Y" in showmore
+
+    async def _iter_loan_pages(
+        self, loan_type: str, page_size: int, concurrency: int, total: Optional[int]
+    ) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        """Pages of raw loan records, in order, with up to `concurrency` pages requested ahead.
+
+        With a known `total` no page past the last one is requested (unless the server
+        still reports more, e.g. after a loan since the count); without it, pages are
+        probed a window at a time and those past the end are dropped.
+        """
+        loans, more = await self._fetch_loans_page(loan_type, 1, page_size)
+        yield loans
+        if not more:
+            return
+
+        known_pages = math.ceil(total / page_size) if total else None
+        next_page = 1
+        in_flight: Deque["asyncio.Future[Tuple[List[Dict[str, Any]], bool]]"] = deque()
+        try:
+            while True:
+                while len(in_flight) < concurrency and (
+                    known_pages is None or next_page < known_pages or not in_flight
+                ):
+                    offset = 1 + next_page * page_size
+                    in_flight.append(asyncio.ensure_future(self._fetch_loans_page(loan_type, offset, page_size)))
+                    next_page += 1
+                loans, more = await in_flight.popleft()
+                if loans:
+                    yield loans
+                if not more or not loans:
+                    return
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def iter_loans(
+        self, loan_type: str = "active", page_size: int = 50, concurrency: int = 4
+    ) -> AsyncIterator[Loan]:
+        """Loans of `loan_type` ("active" or "history"), yielded as each page arrives.
+
+        Paging works as in `get_loans`, so a caller can start on the first loans
+        while later pages are still loading.
+        """
         if not self.token:
             raise ValueError("Not logged in")
 
-        loans_url = f"{self.base_url}/primaws/rest/priv/myaccount/loans"
-        bulk_size = 50
-        offset = 1
-        all_loans = []
+        if loan_type == "history" and self.history_store:
+            await self.sync_loan_history(page_size=page_size, concurrency=concurrency)
+            for record in self.history_store.records(self._history_key()):
+                yield Loan.from_api(record)
+            return
+
+        total = self._active_loans_count if loan_type == "active" else None
+        pages = self._iter_loan_pages(loan_type, page_size, concurrency, total)
+        async with aclosing(pages):
+            async for page in pages:
+                for loan_data in page:
+                    yield Loan.from_api(loan_data)
+
+    async def get_loans(self, loan_type: str = "active", page_size: int = 50, concurrency: int = 4) -> List[Loan]:
+        """All loans of `loan_type` ("active" or "history"), `page_size` per request.
+
+        After the first page, up to `concurrency` further pages are fetched at once:
+        for active loans as many as the count from `get_user_info` (if called first)
+        says exist, for history by probing ahead. Order is kept either way.
+        """
+        return [loan async for loan in self.iter_loans(loan_type, page_size, concurrency)]
 
-        while True:
-            params = {
-                "bulk": str(bulk_size),
-                "lang": "pl",
-                "offset": str(offset),
-                "type": loan_type,
-            }
-            headers = {"Authorization": f"Bearer {self.token}"}
-
-            response = await self.client.get(loans_url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            loans_data = data.get("data", {}).get("loans", {})
+    def _history_key(self) -> str:
+        assert self.institution and self.username
+        return LoanHistoryStore.key(self.base_url, self.institution, self.username)
 
-            current_batch = loans_data.get("loan", [])
-            all_loans.extend([Loan.from_api(loan_data) for loan_data in current_batch])
+    async def sync_loan_history(self, page_size: int = 50, concurrency: int = 4, full: bool = False) -> int:
+        """Bring `history_store` up to date with the server; returns how many loans were new.
 
-            showmore = loans_data.get("showmore", [])
-            # showmore is typically a list like ['Y'] or empty/missing if no more
-            if not showmore or "Y" not in showmore:
-                break
+        History is listed newest first, so pages are fetched one at a time until one
+        contains a loan that is already stored. The first sync (or `full=True`)
+        downloads everything, `concurrency` pages at a time, and replaces the stored copy.
+        """
+        if not self.token:
+            raise ValueError("Not logged in")
+        if not self.history_store:
+            raise ValueError("No history_store configured")
+
+        key = self._history_key()
+        known = set() if full else self.history_store.known_ids(key)
+        records: List[Dict[str, Any]] = []
+        pages = self._iter_loan_pages("history", page_size, concurrency if not known else 1, None)
+        async with aclosing(pages):
+            async for page in pages:
+                records.extend(page)
+                if any(record.get("loanid") in known for record in page):
+                    break
+        if not known:
+            return self.history_store.replace(key, records)
+        return self.history_store.add(key, records)
 
-            offset += bulk_size
+    async def _probe_cover(self, isbn: str) -> Optional[str]:
+        # Covers don't depend on the tenant, so these entries are shared by every account.
+        cached = self._cache_lookup("cover", isbn, tenant=False) or self._cache_lookup("cover_miss", isbn, tenant=False)
+        if cached:
+            return cached[0]
 
-        return all_loans
+        url = self.cover_url_template.format(isbn=isbn)
+        try:
+            # We use a HEAD request to be efficient and not download the whole image
+            response = await self._request("HEAD", url, auth=False, priority=Priority.LOW, follow_redirects=True)
+        except httpx.RequestError:
+            # Connection errors just mean no cover from this ISBN (this time; not cached)
+            return None
+        # OpenLibrary redirects to a placeholder if the image doesn't exist.
+        # A real cover will have a URL that contains the ISBN.
+        if response.status_code == 200 and isbn in str(response.url):
+            self._cache_store("cover", str(response.url), isbn, tenant=False)
+            return str(response.url)
+        if response.status_code in (200, 404):
+            # Most ISBNs have no cover; remember that too, so they aren't re-probed every run.
+            # Anything else (throttling, server errors) says nothing about the cover.
+            self._cache_store("cover_miss", None, isbn, tenant=False)
+        return None
 
     async def get_cover_url(self, isbns: List[str]) -> Optional[str]:
         """Try to find a cover image from OpenLibrary using ISBNs."""
-        base_url = "https://covers.openlibrary.org/b/isbn/{isbn}-M.jpg"
-        for isbn in isbns:
-            url = base_url.format(isbn=isbn)
-            try:
-                # We use a HEAD request to be efficient and not download the whole image
-                response = await self.client.head(url, follow_redirects=True)
-                # OpenLibrary redirects to a placeholder if the image doesn't exist.
-                # A real cover will have a URL that contains the ISBN.
-                if response.status_code == 200 and isbn in str(response.url):
-                    return str(response.url)
-            except httpx.RequestError:
-                # Ignore connection errors and try the next ISBN
-                continue
+        return (await self.get_cover_urls([isbns]))[0]
+
+    async def get_cover_urls(self, isbn_lists: List[List[str]]) -> List[Optional[str]]:
+        """Find covers for many records at once (one ISBN list per record, results in the same order).
+
+        Every distinct ISBN is probed once, concurrently; a record takes the first of its
+        ISBNs to turn up a cover, and probes no unresolved record still needs are cancelled.
+        """
+        covers: List[Optional[str]] = [None] * len(isbn_lists)
+        owners: Dict[str, List[int]] = {}
+        for index, isbns in enumerate(isbn_lists):
+            for isbn in dict.fromkeys(isbns):
+                owners.setdefault(isbn, []).append(index)
+        if not owners:
+            return covers
+
+        probes: Dict["asyncio.Task[Optional[str]]", str] = {
+            asyncio.ensure_future(self._probe_cover(isbn)): isbn for isbn in owners
+        }
+        resolved: Set[int] = set()
+        pending = set(probes)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for probe in done:
+                    url = probe.result()
+                    if not url:
+                        continue
+                    for index in owners[probes[probe]]:
+                        if index not in resolved:
+                            covers[index] = url
+                            resolved.add(index)
+                for probe in [p for p in pending if all(i in resolved for i in owners[probes[p]])]:
+                    probe.cancel()
+                    pending.discard(probe)
+        finally:
+            for probe in pending:
+                probe.cancel()
+        return covers
+
+    async def attach_covers(self, details: List["BookDetails"]) -> None:
+        """Fill in `cover_url` for details fetched with `fetch_cover=False`, in one batched lookup."""
+        covers = await self.get_cover_urls([d.isbns for d in details])
+        for book_details, cover_url in zip(details, covers):
+            book_details.cover_url = cover_url
+
+    def _cache_key(self, *parts: str, tenant: bool = True) -> str:
+        # Record ids are only unique within a tenant, so scope keys to one unless asked not to.
+        if not tenant:
+            return "|".join(parts)
+        return "|".join((self.base_url, self.institution or "", *parts))
+
+    def _cache_lookup(self, namespace: str, *parts: str, tenant: bool = True) -> Optional[Tuple[Any, bool]]:
+        """Return (value, fresh) for a usable cache entry, or None on a miss/expiry.
+
+        Entries older than the namespace's TTL are still returned (as not fresh) while
+        younger than its optional "<namespace>_stale" TTL, for stale-while-revalidate.
+        """
+        cache = self.cache or _batch_cache.get()
+        if not cache:
+            return None
+        entry = cache.get(namespace, self._cache_key(*parts, tenant=tenant))
+        if entry is None:
+            return None
+        if entry.age < self.cache_ttls[namespace]:
+            return entry.value, True
+        if entry.age < self.cache_ttls.get(f"{namespace}_stale", 0):
+            return entry.value, False
         return None
 
-    async def get_record_details(self, mmsid: str) -> "BookDetails":
-        """Fetch full record details (PNX) for a given MMS ID."""
-        if not self.view:
-            raise ValueError("View not set. Please login first.")
+    def _cache_store(self, namespace: str, value: Any, *parts: str, tenant: bool = True) -> None:
+        cache = self.cache or _batch_cache.get()
+        if cache:
+            cache.set(namespace, self._cache_key(*parts, tenant=tenant), value)
+
+    def _spawn(self, coro: Coroutine[Any, Any, Any]) -> None:
+        """Run best-effort background work; `close()` waits for it to finish."""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _single_flight(self, key: Tuple[str, ...], factory: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Run `factory()` once for all concurrent callers asking for the same `key`.
+
+        The shared call is shielded, so one caller giving up doesn't cancel it for the others.
+        It runs outside any caller's request budget, so a caller with little budget left
+        can't fail it for the others. Instead, each budgeted caller must have budget left
+        to join, and is charged the requests the shared call made once it is done.
+        """
+        budget = _request_budget.get()
+        if budget:
+            budget.check()
+        entry = self._in_flight.get(key)
+        if entry is None:
+            shared_budget = _RequestBudget(None)
+            context = contextvars.copy_context()
+            context.run(_request_budget.set, shared_budget)
+            future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_task(factory(), context=context)
+            entry = self._in_flight[key] = (future, shared_budget)
+
+            def forget(done: "asyncio.Future[Any]") -> None:
+                self._in_flight.pop(key, None)
+                # Callers re-raise any error; don't also report it as never retrieved.
+                if not done.cancelled():
+                    done.exception()
+
+            future.add_done_callback(forget)
+        future, shared_budget = entry
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if budget:
+                budget.used += shared_budget.used
 
+    async def _fetch_pnx(self, mmsid: str) -> Dict[str, Any]:
         url = f"{self.base_url}/primaws/rest/pub/pnxs/L/alma{mmsid}"
-        params = {"vid": self.view, "lang": "pl"}
-        response = await self.client.get(url, params=params)
+        params = {"vid": self.view or "", "lang": "pl"}
+        response = await self._request("GET", url, auth=False, hedge=True, params=params)
         response.raise_for_status()
-        data = response.json()
+        pnx = self._json(response).get("pnx", {})
+        # Only the sections BookDetails is built from, to keep cache entries small.
+        pnx = {"display": pnx.get("display", {}), "addata": pnx.get("addata", {})}
+        self._cache_store("pnx", pnx, mmsid)
+        return pnx
+
+    async def _get_pnx(self, mmsid: str) -> Dict[str, Any]:
+        cached = self._cache_lookup("pnx", mmsid)
+        if cached is None:
+            return await self._fetch_pnx(mmsid)
+        pnx, fresh = cached
+        if not fresh:
+            self._spawn(self._fetch_pnx(mmsid))
+        return pnx
+
+    async def get_record_details(self, mmsid: str, fetch_cover: bool = True) -> "BookDetails":
+        """Fetch full record details (PNX) for a given MMS ID.
+
+        With a `cache`, a stale record is returned immediately and refreshed in the background.
+        With `fetch_cover=False` the details come back straight after the PNX fetch, with
+        `cover_url` left unset; callers that want covers later can batch them via `attach_covers`.
+        """
+        if not self.view:
+            raise ValueError("View not set. Please login first.")
+
+        pnx = await self._get_pnx(mmsid)
+        details = self._book_details(mmsid, pnx)
+        if fetch_cover:
+            details.cover_url = await self.get_cover_url(details.isbns)
+        return details
 
-        pnx = data.get("pnx", {})
+    @staticmethod
+    def _book_details(mmsid: str, pnx: Dict[str, Any]) -> "BookDetails":
         display = pnx.get("display", {})
         addata = pnx.get("addata", {})
 
-        isbns = addata.get("isbn", [])
-        cover_url = await self.get_cover_url(isbns)
-
         original_title = None
         if "addtitle" in display:
             for title in display["addtitle"]:
@@ -305,8 +888,7 @@ class OmnisClient:
 
         return BookDetails(
             mmsid=mmsid,
-            cover_url=cover_url,
-            isbns=isbns,
+            isbns=addata.get("isbn", []),
             publisher=display.get("publisher", [None])[0],
             publication_date=display.get("creationdate", [None])[0],
             subjects=display.get("subject", []),
@@ -315,28 +897,103 @@ class OmnisClient:
             original_title=original_title,
         )
 
+    async def _fetch_pnx_batch(self, mmsids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """PNX for several records from one /pnxs search on their OR'ed ids; only the ones found."""
+        clauses = ",OR;".join(f"any,contains,{mmsid}" for mmsid in mmsids)
+        params = self._build_search_params(clauses, limit=len(mmsids), raw_query=True)
+        docs = (await self._pnxs_search(params)).get("docs", [])
+        wanted = set(mmsids)
+        found: Dict[str, Dict[str, Any]] = {}
+        for doc in docs:
+            mmsid = self._bare_mmsid(doc)
+            if mmsid in wanted:
+                pnx = doc.get("pnx", {})
+                found[mmsid] = {"display": pnx.get("display", {}), "addata": pnx.get("addata", {})}
+                self._cache_store("pnx", found[mmsid], mmsid)
+        return found
+
+    async def _fetch_pnx_many(self, mmsids: List[str], chunk_size: int, concurrency: int) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        if self._pnx_search_by_id is not False and len(mmsids) > 1:
+            chunks = [mmsids[i : i + chunk_size] for i in range(0, len(mmsids), chunk_size)]
+            batches = await asyncio.gather(*(self._fetch_pnx_batch(c) for c in chunks), return_exceptions=True)
+            answered = [batch for batch in batches if isinstance(batch, dict)]
+            for batch in answered:
+                found.update(batch)
+            if found:
+                self._pnx_search_by_id = True
+            elif answered:
+                # The search answered, but with nothing for several known-good ids: this
+                # tenant doesn't index them. Failed batches alone (503, timeout) prove nothing.
+                self._pnx_search_by_id = False
+
+        # Records the search didn't return (e.g. a second edition of a work, which Primo
+        # folds into its first) are fetched one by one, a few at a time.
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_one(mmsid: str) -> None:
+            async with semaphore:
+                try:
+                    found[mmsid] = await self._fetch_pnx(mmsid)
+                except httpx.HTTPError:
+                    pass
+
+        await asyncio.gather(*(fetch_one(m) for m in mmsids if m not in found))
+        return found
+
+    async def get_record_details_many(
+        self, mmsids: Sequence[str], fetch_cover: bool = True, chunk_size: int = 20, concurrency: int = 8
+    ) -> Dict[str, "BookDetails"]:
+        """`get_record_details` for many records, in as few requests as possible.
+
+        Uncached records are looked up `chunk_size` at a time through one /pnxs search
+        on their OR'ed ids; whatever that doesn't return (or every record, on tenants
+        where it returns nothing) is fetched singly, at most `concurrency` at once.
+        Stale cached records are returned as-is and refreshed in the background, and
+        covers are attached in one batch. Records that couldn't be fetched are left
+        out of the result, which is keyed by MMS ID in input order.
+        """
+        if not self.view:
+            raise ValueError("View not set. Please login first.")
+
+        unique = list(dict.fromkeys(mmsids))
+        pnxs: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for mmsid in unique:
+            cached = self._cache_lookup("pnx", mmsid)
+            if cached:
+                pnxs[mmsid] = cached[0]
+                if not cached[1]:
+                    stale.append(mmsid)
+        if stale:
+            self._spawn(self._fetch_pnx_many(stale, chunk_size, concurrency))
+        pnxs.update(await self._fetch_pnx_many([m for m in unique if m not in pnxs], chunk_size, concurrency))
+
+        details = {mmsid: self._book_details(mmsid, pnxs[mmsid]) for mmsid in unique if mmsid in pnxs}
+        if fetch_cover:
+            await self.attach_covers(list(details.values()))
+        return details
+
     async def get_personal_settings(self) -> Dict[str, Any]:
         """Fetch full personal details (address, email, etc.)."""
         if not self.token:
             raise ValueError("Not logged in")
 
         url = f"{self.base_url}/primaws/rest/priv/myaccount/personal_settings"
-        headers = {"Authorization": f"Bearer {self.token}"}
 
-        response = await self.client.get(url, params={"lang": "pl"}, headers=headers)
+        response = await self._request("GET", url, params={"lang": "pl"})
         response.raise_for_status()
-        return response.json().get("data", {})
+        return self._json(response).get("data", {})
 
     async def get_fines(self) -> List[Fine]:
         if not self.token:
             raise ValueError("Not logged in")
 
         url = f"{self.base_url}/primaws/rest/priv/myaccount/fines"
-        headers = {"Authorization": f"Bearer {self.token}"}
 
-        response = await self.client.get(url, params={"lang": "pl"}, headers=headers)
+        response = await self._request("GET", url, params={"lang": "pl"})
         response.raise_for_status()
-        data = response.json().get("data", {})
+        data = self._json(response).get("data", {})
         fines_data = data.get("fines", {}).get("fine", [])
         return [Fine.from_api(f) for f in fines_data]
 
@@ -345,11 +1002,10 @@ class OmnisClient:
             raise ValueError("Not logged in")
 
         url = f"{self.base_url}/primaws/rest/priv/myaccount/requests"
-        headers = {"Authorization": f"Bearer {self.token}"}
 
-        response = await self.client.get(url, params={"lang": "pl"}, headers=headers)
+        response = await self._request("GET", url, params={"lang": "pl"})
         response.raise_for_status()
-        data = response.json().get("data", {})
+        data = self._json(response).get("data", {})
 
         items: List[RequestItem] = []
         for plural, singular in (
@@ -370,16 +1026,33 @@ class OmnisClient:
 
         renew_url = f"{self.base_url}/primaws/rest/priv/myaccount/renew_loans"
         params = {"lang": "pl"}
-        headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json;charset=UTF-8"}
+        headers = {"Content-Type": "application/json;charset=UTF-8"}
         data = {"id": loan_id}
 
-        response = await self.client.post(renew_url, params=params, headers=headers, json=data)
+        response = await self._request("POST", renew_url, params=params, headers=headers, json=data)
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
 
     def _build_search_params(
-        self, q: str, qInclude: str = "", sort: str = "rank", limit: int = 10, came_from: Optional[str] = None
+        self,
+        q: str,
+        qInclude: str = "",
+        sort: str = "rank",
+        limit: int = 10,
+        came_from: Optional[str] = None,
+        library_codes: Sequence[str] = (),
+        offset: int = 0,
+        raw_query: bool = False,
     ) -> Dict[str, str]:
+        """Query params for /pnxs (and /delivery, which re-runs the same search).
+
+        `q` is searched as free text, or with `raw_query` passed through as Primo
+        clauses (`field,precision,value[,operator];...`). `library_codes` restricts
+        the search to records with holdings in those libraries: one is added to
+        `qInclude`, several are OR'ed via `multiFacets`.
+        """
+        if len(library_codes) == 1:
+            qInclude = "|,|".join(filter(None, [qInclude, f"facet_library,exact,{library_codes[0]}"]))
         params = {
             "acTriggered": "false",
             "blendFacetsSeparately": "false",
@@ -392,10 +1065,10 @@ class OmnisClient:
             "limit": str(limit),
             "newspapersActive": "false",
             "newspapersSearch": "false",
-            "offset": "0",
+            "offset": str(offset),
             "otbRanking": "false",
             "pcAvailability": "true",
-            "q": f"any,contains,{q}",
+            "q": q if raw_query else f"any,contains,{q}",
             "qExclude": "",
             "qInclude": qInclude,
             "rapido": "false",
@@ -410,25 +1083,65 @@ class OmnisClient:
         }
         if came_from:
             params["came_from"] = came_from
+        if len(library_codes) > 1:
+            params["multiFacets"] = "|,|".join(f"facet_library,include,{code}" for code in library_codes)
         return params
 
+    def _library_code_index(self) -> Dict[str, str]:
+        if self._library_codes is None:
+            cached = self._cache_lookup("library_codes", "index")
+            self._library_codes = dict(cached[0]) if cached else {}
+        return self._library_codes
+
+    def _learn_library_codes(self, delivery_items: List[Dict[str, Any]]) -> None:
+        index = self._library_code_index()
+        learned = {}
+        for item in delivery_items:
+            for holding in (item.get("delivery") or {}).get("holding") or []:
+                name, code = holding.get("mainLocation"), holding.get("libraryCode")
+                if name and code and index.get(name) != code:
+                    learned[name] = code
+        if learned:
+            index.update(learned)
+            self._cache_store("library_codes", index, "index")
+
+    def _library_codes_for(self, needles: Sequence[str]) -> List[str]:
+        """Codes of the known libraries whose name contains any of `needles` (lowercase).
+
+        The index only holds libraries seen in earlier delivery responses, so a name
+        fragment ("filia 5") may also match libraries it doesn't know yet ("Filia 56"),
+        and a search restricted to the known ones would silently lose their works.
+        Empty unless every needle is the full name of a known library; fragments are
+        left to the client-side filter.
+        """
+        index = self._library_code_index()
+        names = {name.lower() for name in index}
+        if not all(needle in names for needle in needles):
+            return []
+        return sorted({code for name, code in index.items() if any(n in name.lower() for n in needles)})
+
     async def _pnxs_search(self, params: Dict[str, str]) -> Dict[str, Any]:
-        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-        response = await self.client.get(f"{self.base_url}/primaws/rest/pub/pnxs", params=params, headers=headers)
+        response = await self._request(
+            "GET", f"{self.base_url}/primaws/rest/pub/pnxs", priority=Priority.HIGH, hedge=True, params=params
+        )
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
 
     async def _pnxs_delivery(self, params: Dict[str, str], alma_ids: List[str]) -> List[Dict[str, Any]]:
         if not alma_ids:
             return []
         headers = {"Content-Type": "application/json;charset=UTF-8"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
-        response = await self.client.post(
-            f"{self.base_url}/primaws/rest/pub/delivery", params=params, headers=headers, json=alma_ids
+        response = await self._request(
+            "POST",
+            f"{self.base_url}/primaws/rest/pub/delivery",
+            priority=Priority.HIGH,
+            idempotent=True,
+            params=params,
+            headers=headers,
+            json=alma_ids,
         )
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
 
     @staticmethod
     def _display_first(doc: Dict[str, Any], field: str) -> Optional[str]:
@@ -461,6 +1174,18 @@ class OmnisClient:
         return alma_id or ""
 
     async def _get_physical_service_id(self, bare_mmsid: str) -> Optional[str]:
+        # The record -> physical service mapping is effectively static, so it's cached long-term;
+        # failures (None) only briefly, so a transient error doesn't hide due dates for long.
+        cached = self._cache_lookup("physical_service", bare_mmsid) or self._cache_lookup(
+            "physical_service_miss", bare_mmsid
+        )
+        if cached:
+            return cached[0]
+        service_id = await self._fetch_physical_service_id(bare_mmsid)
+        self._cache_store("physical_service" if service_id else "physical_service_miss", service_id, bare_mmsid)
+        return service_id
+
+    async def _fetch_physical_service_id(self, bare_mmsid: str) -> Optional[str]:
         params = {
             "vid": self.view or "",
             "lang": "pl",
@@ -469,18 +1194,39 @@ class OmnisClient:
             "resource_type": "book",
             "isRapido": "false",
         }
-        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
         try:
-            response = await self.client.get(
-                f"{self.base_url}/primaws/rest/pub/getPhysicalService/{bare_mmsid}", params=params, headers=headers
+            response = await self._request(
+                "GET", f"{self.base_url}/primaws/rest/pub/getPhysicalService/{bare_mmsid}", params=params
             )
             response.raise_for_status()
-            return response.json().get("physicalServiceId")
+            return self._json(response).get("physicalServiceId")
         except httpx.HTTPError:
             return None
 
     async def _get_due_date_for_holding(
         self, bare_mmsid: str, holding: Dict[str, Any], physical_service_id: str
+    ) -> Optional[Tuple[Optional[str], bool]]:
+        """Due date (and overdue flag) for a single branch holding, via a short-lived cache.
+
+        Returns None if the lookup failed, (None, False) if the holding has no due date.
+        """
+        holding_key = holding.get("holdId") or holding.get("mainLocation", "")
+        cached = self._cache_lookup("holding", bare_mmsid, holding_key) or self._cache_lookup(
+            "holding_miss", bare_mmsid, holding_key
+        )
+        if cached:
+            value = cached[0]
+            return (value[0], value[1]) if value is not None else None
+
+        result = await self._fetch_due_date_for_holding(bare_mmsid, holding, physical_service_id)
+        if result is None:
+            self._cache_store("holding_miss", None, bare_mmsid, holding_key)
+        else:
+            self._cache_store("holding", list(result), bare_mmsid, holding_key)
+        return result
+
+    async def _fetch_due_date_for_holding(
+        self, bare_mmsid: str, holding: Dict[str, Any], physical_service_id: str
     ) -> Optional[Tuple[Optional[str], bool]]:
         """Fetch item-level status for a single branch holding to extract its due date, if any."""
         main_location = holding.get("mainLocation", "")
@@ -500,165 +1246,805 @@ class OmnisClient:
             "hideResourceSharing": False,
         }
         headers = {"Content-Type": "application/json;charset=UTF-8"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         try:
-            response = await self.client.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/primaws/rest/priv/ILSServices/holdings/{physical_service_id}",
+                priority=Priority.LOW,
+                idempotent=True,
                 params={"record-institution": self.institution, "lang": "pl"},
                 headers=headers,
                 json=body,
             )
             response.raise_for_status()
-            data = response.json()
+            data = self._json(response)
         except httpx.HTTPError:
             return None
 
-        for loc in data.get("data", {}).get("itemInfo", {}).get("locations", []):
-            for item in loc.get("items", []):
-                status_name = item.get("itemstatusname", "")
-                match = re.search(r"(\d{2}/\d{2}/\d{4})", status_name)
-                if match:
-                    overdue = "przekroczon" in status_name.lower()
-                    return match.group(1), overdue
+        items = [item for loc in self._holdings_locations(data) for item in loc.get("items", [])]
+        return self._due_date_from_items(items)
+
+    @staticmethod
+    def _holdings_locations(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return data.get("data", {}).get("itemInfo", {}).get("locations", []) or []
+
+    @staticmethod
+    def _due_date_from_items(items: List[Dict[str, Any]]) -> Tuple[Optional[str], bool]:
+        for item in items:
+            status_name = item.get("itemstatusname", "")
+            match = _DUE_DATE_RE.search(status_name)
+            if match:
+                overdue = "przekroczon" in status_name.lower()
+                return match.group(1), overdue
         return None, False
 
-    async def search_books(
-        self, query: str, limit: int = 10, branch_filter: Optional[str] = None, fetch_due_dates: bool = True
-    ) -> List[SearchResult]:
-        """Search the catalog by title/keyword.
+    @staticmethod
+    def _holding_match_keys(location: Dict[str, Any]) -> List[str]:
+        """Identifiers a holdings-response location can be matched back to its request holding by, best first."""
+        keys = []
+        hold_id = location.get("holdId") or location.get("holid")
+        if hold_id:
+            keys.append(f"hold:{hold_id}")
+        if location.get("libraryCode"):
+            keys.append(f"lib:{location['libraryCode']}")
+        if location.get("mainLocation"):
+            keys.append(f"main:{location['mainLocation']}")
+        return keys
+
+    async def _get_due_dates_for_holdings(
+        self, bare_mmsid: str, holdings: List[Dict[str, Any]], physical_service_id: str
+    ) -> List[Optional[Tuple[Optional[str], bool]]]:
+        """Due dates for several branch holdings of one record, in as few holdings requests as possible.
+
+        The holdings endpoint takes a list of locations, so all uncached holdings go in a
+        single request and the returned locations are mapped back to them. Holdings the
+        response can't be unambiguously mapped to, or tenants that reject multi-location
+        bodies, fall back to one request per branch (`_get_due_date_for_holding`).
+        """
+        results: List[Optional[Tuple[Optional[str], bool]]] = [None] * len(holdings)
+        uncached: List[int] = []
+        holding_keys = [h.get("holdId") or h.get("mainLocation", "") for h in holdings]
+        for index, holding_key in enumerate(holding_keys):
+            cached = self._cache_lookup("holding", bare_mmsid, holding_key) or self._cache_lookup(
+                "holding_miss", bare_mmsid, holding_key
+            )
+            if cached:
+                value = cached[0]
+                results[index] = (value[0], value[1]) if value is not None else None
+            else:
+                uncached.append(index)
 
-        A single title (frbrgroupid) can have multiple editions/versions; all are fetched and
-        kept distinguished under one SearchResult. Availability is resolved per branch, and for
-        branches that are currently unavailable, the due date is fetched separately since Primo
-        only exposes it at the individual-item level.
+        fallback = uncached
+        if len(uncached) > 1 and self._multi_location_holdings is not False:
+            try:
+                batch = await self._fetch_due_dates_for_holdings(
+                    bare_mmsid, [holdings[i] for i in uncached], physical_service_id
+                )
+            except httpx.HTTPError:
+                # Same as a failed single lookup: no due dates this time, retried after holding_miss.
+                for index in uncached:
+                    self._cache_store("holding_miss", None, bare_mmsid, holding_keys[index])
+                return results
+            if batch is not None and not any(batch):
+                # Nothing in the response could be mapped back; per-branch requests it is.
+                self._multi_location_holdings = False
+            elif batch is not None:
+                self._multi_location_holdings = True
+                fallback = []
+                for index, result in zip(uncached, batch):
+                    if result is None:
+                        fallback.append(index)
+                        continue
+                    results[index] = result
+                    self._cache_store("holding", list(result), bare_mmsid, holding_keys[index])
+
+        fallback_results = await asyncio.gather(
+            *(self._get_due_date_for_holding(bare_mmsid, holdings[i], physical_service_id) for i in fallback)
+        )
+        for index, result in zip(fallback, fallback_results):
+            results[index] = result
+        return results
+
+    async def _fetch_due_dates_for_holdings(
+        self, bare_mmsid: str, holdings: List[Dict[str, Any]], physical_service_id: str
+    ) -> Optional[List[Optional[Tuple[Optional[str], bool]]]]:
+        """One multi-location holdings request; None if the tenant rejected it (4xx).
+
+        Per-holding entries are None when no returned location maps to that holding.
+        Other failures raise `httpx.HTTPError`.
         """
-        if not self.token:
-            raise ValueError("Not logged in")
+        main_locations = list(dict.fromkeys(h.get("mainLocation", "") for h in holdings))
+        body = {
+            "filters": {
+                "noItem": 10 * len(holdings),
+                "sublibrary": "",
+                "collection": "",
+                "callnumber": "",
+                "holid": "",
+                "sublibs": ",".join(main_locations),
+                "ilsRecordList": [{"institution": self.institution, "recordId": bare_mmsid}],
+                "vid": self.view,
+                "filterCall": True,
+            },
+            "locations": holdings,
+            "hideResourceSharing": False,
+        }
+        headers = {"Content-Type": "application/json;charset=UTF-8"}
+        response = await self._request(
+            "POST",
+            f"{self.base_url}/primaws/rest/priv/ILSServices/holdings/{physical_service_id}",
+            priority=Priority.LOW,
+            idempotent=True,
+            params={"record-institution": self.institution, "lang": "pl"},
+            headers=headers,
+            json=body,
+        )
+        if 400 <= response.status_code < 500 and response.status_code not in (401, 429):
+            # The tenant doesn't accept several locations at once; stop trying for this client.
+            self._multi_location_holdings = False
+            return None
+        response.raise_for_status()
+        data = self._json(response)
+
+        by_key: Dict[str, List[int]] = {}
+        for index, holding in enumerate(holdings):
+            for key in self._holding_match_keys(holding):
+                by_key.setdefault(key, []).append(index)
+
+        results: List[Optional[Tuple[Optional[str], bool]]] = [None] * len(holdings)
+        for loc in self._holdings_locations(data):
+            for key in self._holding_match_keys(loc):
+                matches = by_key.get(key, [])
+                if len(matches) == 1:
+                    results[matches[0]] = self._due_date_from_items(loc.get("items", []))
+                    break
+        return results
 
-        top_params = self._build_search_params(query, limit=limit)
-        top_data = await self._pnxs_search(top_params)
-        top_docs = top_data.get("docs", [])
+    def _is_single_version(self, doc: Dict[str, Any]) -> bool:
+        """Whether a top-level doc is known to be the only edition of its work.
 
-        async def resolve_versions_with_delivery(
-            doc: Dict[str, Any],
-        ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
-            # The delivery endpoint re-runs its own search internally using the given query
-            # params (q/qInclude/sort) and only reports on ids that fall within that same
-            # result page, so it must be called once per distinct query variant (i.e. once
-            # per version-group), using that group's own params and doc ids.
-            frbrgroupid = self._extract_frbrgroupid(doc)
-            if frbrgroupid:
-                # A work's edition count is independent of how many distinct works the
-                # top-level search returned, so use a generously high fixed limit here
-                # rather than the (often much smaller) top-level `limit`.
-                group_params = self._build_search_params(
-                    query,
-                    qInclude=f"facet_frbrgroupid,exact,{frbrgroupid}",
-                    sort="date_d",
-                    limit=50,
-                    came_from="addFacet",
+        Primo marks multi-edition group representatives with FRBR type "5"; other
+        types are standalone records. Without that facet, fall back to the group
+        sizes remembered from earlier group expansions.
+        """
+        frbrgroupid = self._extract_frbrgroupid(doc)
+        if not frbrgroupid:
+            return True
+        frbrtype = doc.get("pnx", {}).get("facets", {}).get("frbrtype")
+        if frbrtype:
+            return frbrtype[0] != "5"
+        cached = self._cache_lookup("frbr_group", frbrgroupid)
+        return cached is not None and len(cached[0]["docs"]) == 1
+
+    def _group_search_params(self, query: str, frbrgroupid: str, library_codes: Sequence[str] = ()) -> Dict[str, str]:
+        # A work's edition count is independent of how many distinct works the
+        # top-level search returned, so use a generously high fixed limit here
+        # rather than the (often much smaller) top-level `limit`.
+        return self._build_search_params(
+            query,
+            qInclude=f"facet_frbrgroupid,exact,{frbrgroupid}",
+            sort="date_d",
+            limit=50,
+            came_from="addFacet",
+            library_codes=library_codes,
+        )
+
+    async def _expand_group(
+        self, query: str, frbrgroupid: str, library_codes: Sequence[str] = ()
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """All edition docs of a work, plus the search params they were found with.
+
+        The editions barely change, so with a `cache` they're reused across queries.
+        Delivery must be asked with the params of the search the docs came from, so a
+        cached group also remembers its query and hands back params rebuilt from it.
+        With `library_codes`, a cached (complete) group is still used as-is, but a
+        fresh expansion only returns the editions held there and isn't cached.
+        """
+        cached = self._cache_lookup("frbr_group", frbrgroupid)
+        if cached:
+            group = cached[0]
+            return group["docs"], self._group_search_params(group["query"], frbrgroupid)
+        params = self._group_search_params(query, frbrgroupid, library_codes)
+        docs = (await self._pnxs_search(params)).get("docs", [])
+        if docs and not library_codes:
+            # Only the sections search results are built from, to keep cache entries small.
+            slim = [{"pnx": {k: d.get("pnx", {}).get(k, {}) for k in ("display", "addata", "control")}} for d in docs]
+            self._cache_store("frbr_group", {"query": query, "docs": slim}, frbrgroupid)
+        return docs, params
+
+    async def _delivery_map(self, query_params: Dict[str, str], alma_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        delivery_by_id: Dict[str, Dict[str, Any]] = {}
+        if not alma_ids:
+            return delivery_by_id
+        delivery_items = await self._pnxs_delivery(query_params, alma_ids)
+        self._learn_library_codes(delivery_items)
+        for item in delivery_items:
+            rid = self._alma_id(item)
+            if rid:
+                delivery_by_id[rid] = item
+        return delivery_by_id
+
+    async def _resolve_versions_with_delivery(
+        self,
+        query: str,
+        doc: Dict[str, Any],
+        top_params: Dict[str, str],
+        depth: int = SearchDepth.DUE_DATES,
+        shared_delivery: "Optional[asyncio.Future[Dict[str, Dict[str, Any]]]]" = None,
+        library_codes: Sequence[str] = (),
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Dict[str, Any]]], bool]:
+        """Version docs and delivery map (None if not fetched) for one work, plus whether that's complete.
+
+        `shared_delivery`, if given, is one delivery call made with the top-level
+        params for all single-edition works, and is used instead of a per-work call.
+        `library_codes` limits the editions expanded to those held in these libraries.
+        """
+        complete = True
+        # The delivery endpoint re-runs its own search internally using the given query
+        # params (q/qInclude/sort) and only reports on ids that fall within that same
+        # result page, so it must be called once per distinct query variant (i.e. once
+        # per version-group), using that group's own params and doc ids.
+        version_docs = [doc]
+        delivery_query_params = top_params
+        frbrgroupid = self._extract_frbrgroupid(doc)
+        single_version = self._is_single_version(doc)
+        if frbrgroupid and not single_version and depth >= SearchDepth.VERSIONS:
+            try:
+                group_docs, group_params = await self._single_flight(
+                    ("frbr_group", query, frbrgroupid, *library_codes),
+                    lambda: self._expand_group(query, frbrgroupid, library_codes),
                 )
-                group_data = await self._pnxs_search(group_params)
-                version_docs = group_data.get("docs", []) or [doc]
-                delivery_query_params = group_params
+            except SearchBudgetExceeded:
+                complete = False
             else:
-                version_docs = [doc]
-                delivery_query_params = top_params
+                version_docs = group_docs or [doc]
+                delivery_query_params = group_params
 
+        if depth < SearchDepth.DELIVERY:
+            return version_docs, None, complete
+
+        try:
+            if single_version and shared_delivery is not None:
+                # Shielded: one work being cancelled mustn't cancel the call the others share.
+                return version_docs, await asyncio.shield(shared_delivery), complete
             alma_ids = list(dict.fromkeys(i for i in (self._alma_id(d) for d in version_docs) if i))
-            delivery_by_id: Dict[str, Dict[str, Any]] = {}
-            if alma_ids:
-                delivery_items = await self._pnxs_delivery(delivery_query_params, alma_ids)
-                for item in delivery_items:
-                    rid = self._alma_id(item)
-                    if rid:
-                        delivery_by_id[rid] = item
-
-            return version_docs, delivery_by_id
-
-        resolved = await asyncio.gather(*(resolve_versions_with_delivery(doc) for doc in top_docs))
-        versions_per_work = [r[0] for r in resolved]
-        delivery_maps_per_work = [r[1] for r in resolved]
-
-        branch_filter_lower = branch_filter.lower() if branch_filter else None
-        enrich_targets: List[Tuple[BranchAvailability, str, Dict[str, Any]]] = []
-        results: List[SearchResult] = []
-
-        for doc, versions, delivery_by_id in zip(top_docs, versions_per_work, delivery_maps_per_work):
-            frbrgroupid = self._extract_frbrgroupid(doc)
-            title = self._addata_first(doc, "btitle") or self._display_first(doc, "title") or "Unknown"
-            author = self._addata_first(doc, "au")
-
-            book_versions: List[BookVersion] = []
-            for v in versions:
-                alma_id = self._alma_id(v)
-                delivery_item = delivery_by_id.get(alma_id, {}) if alma_id else {}
-                holdings = (delivery_item.get("delivery") or {}).get("holding") or []
-
-                branches: List[BranchAvailability] = []
-                for h in holdings:
-                    main_location = h.get("mainLocation", "")
-                    if branch_filter_lower and branch_filter_lower not in main_location.lower():
-                        continue
-                    branch = BranchAvailability(
-                        library_name=main_location,
-                        library_code=h.get("libraryCode", ""),
-                        sub_location=h.get("subLocation"),
-                        maps_url=h.get("stackMapUrl"),
-                        status=h.get("availabilityStatus", "unknown"),
-                    )
-                    branches.append(branch)
-                    if fetch_due_dates and branch.status == "unavailable":
-                        bare_mmsid = self._bare_mmsid(v)
-                        enrich_targets.append((branch, bare_mmsid, h))
+            return version_docs, await self._delivery_map(delivery_query_params, alma_ids), complete
+        except SearchBudgetExceeded:
+            return version_docs, None, False
 
-                if branch_filter_lower and not branches:
+    def _build_search_result(
+        self,
+        doc: Dict[str, Any],
+        versions: List[Dict[str, Any]],
+        delivery_by_id: Optional[Dict[str, Dict[str, Any]]],
+        branch_needles: Sequence[str],
+        fetch_due_dates: bool,
+    ) -> Tuple[Optional[SearchResult], Dict[str, List[Tuple[BranchAvailability, Dict[str, Any]]]]]:
+        """Turn one work's version docs + delivery map into a SearchResult.
+
+        `branch_needles` are lowercase branch-name fragments, any of which a branch
+        must contain to be kept. Also returns the unavailable branches still needing
+        a due date, grouped by bare mmsid. The result is None if the filter leaves
+        nothing of the work; without a delivery map there's no branch data to filter
+        on, so nothing is dropped.
+        """
+        if delivery_by_id is None:
+            branch_needles = ()
+        delivery_by_id = delivery_by_id or {}
+        enrich_targets: Dict[str, List[Tuple[BranchAvailability, Dict[str, Any]]]] = {}
+
+        frbrgroupid = self._extract_frbrgroupid(doc)
+        title = self._addata_first(doc, "btitle") or self._display_first(doc, "title") or "Unknown"
+        author = self._addata_first(doc, "au")
+
+        book_versions: List[BookVersion] = []
+        for v in versions:
+            alma_id = self._alma_id(v)
+            delivery_item = delivery_by_id.get(alma_id, {}) if alma_id else {}
+            holdings = (delivery_item.get("delivery") or {}).get("holding") or []
+
+            branches: List[BranchAvailability] = []
+            for h in holdings:
+                main_location = h.get("mainLocation", "")
+                if branch_needles and not any(n in main_location.lower() for n in branch_needles):
                     continue
-
-                book_versions.append(
-                    BookVersion(
-                        mmsid=self._bare_mmsid(v),
-                        title=self._display_first(v, "title") or title,
-                        author=self._addata_first(v, "au") or author,
-                        edition=self._display_first(v, "edition"),
-                        publisher=self._addata_first(v, "pub"),
-                        publication_date=self._addata_first(v, "date"),
-                        isbns=v.get("pnx", {}).get("addata", {}).get("isbn", []),
-                        frbrgroupid=frbrgroupid,
-                        series=self._addata_first(v, "seriestitle"),
-                        genres=v.get("pnx", {}).get("display", {}).get("genre", []),
-                        subjects=v.get("pnx", {}).get("display", {}).get("subject", []),
-                        language=self._display_first(v, "language"),
-                        physical_description=self._display_first(v, "format"),
-                        branches=branches,
-                    )
+                branch = BranchAvailability(
+                    library_name=main_location,
+                    library_code=h.get("libraryCode", ""),
+                    sub_location=h.get("subLocation"),
+                    maps_url=h.get("stackMapUrl"),
+                    status=h.get("availabilityStatus", "unknown"),
                 )
+                branches.append(branch)
+                if fetch_due_dates and branch.status == "unavailable":
+                    enrich_targets.setdefault(self._bare_mmsid(v), []).append((branch, h))
 
-            if branch_filter_lower and not book_versions:
+            if branch_needles and not branches:
                 continue
 
-            results.append(SearchResult(frbrgroupid=frbrgroupid, title=title, author=author, versions=book_versions))
+            book_versions.append(
+                BookVersion(
+                    mmsid=self._bare_mmsid(v),
+                    title=self._display_first(v, "title") or title,
+                    author=self._addata_first(v, "au") or author,
+                    edition=self._display_first(v, "edition"),
+                    publisher=self._addata_first(v, "pub"),
+                    publication_date=self._addata_first(v, "date"),
+                    isbns=v.get("pnx", {}).get("addata", {}).get("isbn", []),
+                    frbrgroupid=frbrgroupid,
+                    series=self._addata_first(v, "seriestitle"),
+                    genres=v.get("pnx", {}).get("display", {}).get("genre", []),
+                    subjects=v.get("pnx", {}).get("display", {}).get("subject", []),
+                    language=self._display_first(v, "language"),
+                    physical_description=self._display_first(v, "format"),
+                    branches=branches,
+                )
+            )
 
-        if enrich_targets:
-            unique_mmsids = list(dict.fromkeys(m for _, m, _ in enrich_targets))
-            service_ids = await asyncio.gather(*(self._get_physical_service_id(m) for m in unique_mmsids))
-            service_id_map = dict(zip(unique_mmsids, service_ids))
+        if branch_needles and not book_versions:
+            return None, {}
+        result = SearchResult(frbrgroupid=frbrgroupid, title=title, author=author, versions=book_versions)
+        return result, enrich_targets
 
-            async def enrich(branch: BranchAvailability, bare_mmsid: str, holding: Dict[str, Any]) -> None:
-                service_id = service_id_map.get(bare_mmsid)
-                if not service_id:
-                    return
-                result = await self._get_due_date_for_holding(bare_mmsid, holding, service_id)
-                if result:
-                    due_date, overdue = result
-                    branch.due_date = due_date
-                    branch.overdue = overdue
+    async def _enrich_due_dates(
+        self, bare_mmsid: str, targets: List[Tuple[BranchAvailability, Dict[str, Any]]]
+    ) -> None:
+        service_id = await self._single_flight(
+            ("physical_service", bare_mmsid), lambda: self._get_physical_service_id(bare_mmsid)
+        )
+        if not service_id:
+            return
+        holdings = [h for _, h in targets]
+        holding_keys = tuple(h.get("holdId") or h.get("mainLocation", "") for h in holdings)
+        due_dates = await self._single_flight(
+            ("holdings", bare_mmsid, *holding_keys),
+            lambda: self._get_due_dates_for_holdings(bare_mmsid, holdings, service_id),
+        )
+        for (branch, _), result in zip(targets, due_dates):
+            if result:
+                branch.due_date, branch.overdue = result
 
-            await asyncio.gather(*(enrich(b, m, h) for b, m, h in enrich_targets))
+    async def iter_search_books(
+        self,
+        query: str,
+        limit: int = 10,
+        branch_filter: Union[str, Sequence[str], None] = None,
+        fetch_due_dates: bool = True,
+        depth: SearchDepth = SearchDepth.DUE_DATES,
+        max_requests: Optional[int] = None,
+        deadline: Optional[float] = None,
+        max_pages: int = 1,
+        stop_after: Optional[int] = None,
+        available_only: bool = False,
+    ) -> AsyncIterator[SearchUpdate]:
+        """Streaming variant of `search_books`: yields each work as soon as it resolves.
+
+        A work is first yielded (`kind="result"`) once its versions and per-branch
+        availability are known; if it has borrowed copies, the same SearchResult is
+        yielded again (`kind="due_dates"`) as their due dates get filled in. `done`
+        marks the last update for a work, and `rank` its position in the catalog's
+        ranking (updates arrive in completion order, not rank order).
+
+        `branch_filter` keeps only branches whose name contains the given text, or
+        any of several; one search then covers every branch of interest (see
+        `omnis.availability` for comparing them). `available_only` also drops works
+        with no copy on the shelf there.
+
+        `limit` is the page size; up to `max_pages` pages are read, each one fetched
+        while the previous page's works are still being resolved. With `stop_after`,
+        no further page is started once that many works have matched, so a few more
+        may still come from pages already in flight.
+
+        `depth` limits how far each work is followed (`fetch_due_dates=False` is the
+        same as `SearchDepth.DELIVERY`). `max_requests` caps the HTTP requests this
+        search may send and `deadline` (seconds) its wall-clock time; when either runs
+        out, the remaining works are finished with what's known so far and marked
+        `complete=False`. If not even the top-level search fits, `SearchBudgetExceeded`
+        is raised.
+        """
+        if not self.token:
+            raise ValueError("Not logged in")
+        if not fetch_due_dates:
+            depth = min(depth, SearchDepth.DELIVERY)
+
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline if deadline is not None else None
+
+        def remaining() -> Optional[float]:
+            return None if expires_at is None else max(0.0, expires_at - loop.time())
+
+        # The search's own tasks run in a copied context holding its request budget, so
+        # the caller's requests between updates never count against it.
+        context = contextvars.copy_context()
+        context.run(_request_budget.set, _RequestBudget(max_requests))
+
+        # With the branch's library code(s) known, the catalog itself drops works and
+        # editions held elsewhere, before any delivery or due-date request is made.
+        if isinstance(branch_filter, str):
+            branch_filter = [branch_filter]
+        branch_needles = [b.lower() for b in branch_filter or ()]
+        library_codes = self._library_codes_for(branch_needles) if branch_needles else []
+
+        async def top_search(offset: int) -> Tuple[Dict[str, str], List[Dict[str, Any]], Optional[int]]:
+            nonlocal library_codes
+            params = self._build_search_params(query, limit=limit, library_codes=library_codes, offset=offset)
+            data = await self._pnxs_search(params)
+            if not data.get("docs") and library_codes and offset == 0:
+                # Either nothing is held there, or the facet doesn't match how this
+                # catalog names its libraries; an unfiltered search tells them apart.
+                library_codes = []
+                params = self._build_search_params(query, limit=limit)
+                data = await self._pnxs_search(params)
+            return params, data.get("docs", []), (data.get("info") or {}).get("total")
+
+        first_task = loop.create_task(top_search(0), context=context)
+        try:
+            first_page = await asyncio.wait_for(first_task, remaining())
+        except asyncio.TimeoutError:
+            raise SearchBudgetExceeded(f"No catalog answer within the {deadline}s deadline") from None
+
+        # Finished tasks are queued too, so their exceptions surface in the consumer.
+        queue: "asyncio.Queue[Union[SearchUpdate, asyncio.Task[None]]]" = asyncio.Queue()
+        pending: Set["asyncio.Task[None]"] = set()
+        page_fetches: Set["asyncio.Task[None]"] = set()
+        shared_deliveries: List["asyncio.Task[Dict[str, Dict[str, Any]]]"] = []
+
+        # Every top-level doc seen so far, by rank, and how many works have matched.
+        top_docs: Dict[int, Dict[str, Any]] = {}
+        matched = 0
+        # Due-date lookups still outstanding per work, to know which update is its last.
+        outstanding: Dict[int, int] = {}
+        # Works that have been yielded but aren't done yet, and ranks already resolved.
+        open_results: Dict[int, SearchResult] = {}
+        resolved: Set[int] = set()
+
+        def enough() -> bool:
+            return stop_after is not None and matched >= stop_after
+
+        def finished(task: "asyncio.Task[None]") -> None:
+            pending.discard(task)
+            queue.put_nowait(task)
+
+        def start(coro: Coroutine[Any, Any, None]) -> "asyncio.Task[None]":
+            task = loop.create_task(coro, context=context)
+            pending.add(task)
+            task.add_done_callback(finished)
+            return task
+
+        async def enrich(
+            rank: int, result: SearchResult, bare_mmsid: str, targets: List[Tuple[BranchAvailability, Dict[str, Any]]]
+        ) -> None:
+            try:
+                await self._enrich_due_dates(bare_mmsid, targets)
+            except SearchBudgetExceeded:
+                result.complete = False
+            outstanding[rank] -= 1
+            queue.put_nowait(SearchUpdate(kind="due_dates", rank=rank, result=result, done=outstanding[rank] == 0))
+
+        async def resolve(
+            rank: int,
+            doc: Dict[str, Any],
+            page_params: Dict[str, str],
+            shared_delivery: "Optional[asyncio.Task[Dict[str, Dict[str, Any]]]]",
+        ) -> None:
+            nonlocal matched
+            versions, delivery_by_id, complete = await self._resolve_versions_with_delivery(
+                query, doc, page_params, depth, shared_delivery, library_codes
+            )
+            result, enrich_targets = self._build_search_result(
+                doc, versions, delivery_by_id, branch_needles, depth >= SearchDepth.DUE_DATES
+            )
+            resolved.add(rank)
+            if result is None:
+                return
+            if (
+                available_only
+                and delivery_by_id is not None
+                and not any(b.status == "available" for v in result.versions for b in v.branches)
+            ):
+                return
+            result.complete = complete
+            matched += 1
+            if enough():
+                for task in page_fetches:
+                    task.cancel()
+            outstanding[rank] = len(enrich_targets)
+            queue.put_nowait(SearchUpdate(kind="result", rank=rank, result=result, done=not enrich_targets))
+            for bare_mmsid, targets in enrich_targets.items():
+                start(enrich(rank, result, bare_mmsid, targets))
+
+        def begin_page(page: int, params: Dict[str, str], docs: List[Dict[str, Any]], total: Optional[int]) -> None:
+            first_rank = page * limit
+            # Works known to have a single edition need no group expansion, and their
+            # availability can all come from one delivery call against this page.
+            shared_delivery: "Optional[asyncio.Task[Dict[str, Dict[str, Any]]]]" = None
+            single_ids = list(
+                dict.fromkeys(i for i in (self._alma_id(d) for d in docs if self._is_single_version(d)) if i)
+            )
+            if depth >= SearchDepth.DELIVERY and single_ids:
+                shared_delivery = loop.create_task(self._delivery_map(params, single_ids), context=context)
+                # Each waiting work re-raises its error; don't also report it as never retrieved.
+                shared_delivery.add_done_callback(lambda t: t.cancelled() or t.exception())
+                shared_deliveries.append(shared_delivery)
+
+            for i, doc in enumerate(docs):
+                top_docs[first_rank + i] = doc
+                start(resolve(first_rank + i, doc, params, shared_delivery))
+
+            # Fetch the next page while this one's works are being resolved.
+            more = len(docs) == limit and (total is None or first_rank + len(docs) < total)
+            if more and page + 1 < max_pages and not enough():
+                task = start(next_page(page + 1))
+                page_fetches.add(task)
+                task.add_done_callback(page_fetches.discard)
+
+        async def next_page(page: int) -> None:
+            try:
+                params, docs, total = await top_search(page * limit)
+            except SearchBudgetExceeded:
+                return
+            if not enough():
+                begin_page(page, params, docs, total)
 
-        return results
+        begin_page(0, *first_page)
+
+        timed_out = False
+        try:
+            while pending or not queue.empty():
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining())
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if isinstance(item, asyncio.Task):
+                    if not item.cancelled():
+                        item.result()
+                    continue
+                if item.done:
+                    open_results.pop(item.rank, None)
+                else:
+                    open_results[item.rank] = item.result
+                yield item
+        finally:
+            for task in pending:
+                task.cancel()
+            for delivery in shared_deliveries:
+                delivery.cancel()
+
+        if timed_out:
+            # Deadline hit: close out every work with whatever is known about it.
+            for rank, doc in sorted(top_docs.items()):
+                if rank in open_results:
+                    open_results[rank].complete = False
+                    yield SearchUpdate(kind="due_dates", rank=rank, result=open_results[rank], done=True)
+                elif rank not in resolved:
+                    partial, _ = self._build_search_result(doc, [doc], None, (), False)
+                    assert partial is not None
+                    partial.complete = False
+                    yield SearchUpdate(kind="result", rank=rank, result=partial, done=True)
+
+    async def search_books(
+        self,
+        query: str,
+        limit: int = 10,
+        branch_filter: Union[str, Sequence[str], None] = None,
+        fetch_due_dates: bool = True,
+        depth: SearchDepth = SearchDepth.DUE_DATES,
+        max_requests: Optional[int] = None,
+        deadline: Optional[float] = None,
+        max_pages: int = 1,
+        stop_after: Optional[int] = None,
+        available_only: bool = False,
+    ) -> List[SearchResult]:
+        """Search the catalog by title/keyword.
+
+        A single title (frbrgroupid) can have multiple editions/versions; all are fetched and
+        kept distinguished under one SearchResult. Availability is resolved per branch, and for
+        branches that are currently unavailable, the due date is fetched separately since Primo
+        only exposes it at the individual-item level.
+
+        `depth`, `max_requests` and `deadline` trade completeness for latency, and
+        `max_pages`/`stop_after`/`available_only` control paging; see `iter_search_books`.
+        """
+        results: Dict[int, SearchResult] = {}
+        async for update in self.iter_search_books(
+            query,
+            limit,
+            branch_filter,
+            fetch_due_dates,
+            depth,
+            max_requests,
+            deadline,
+            max_pages=max_pages,
+            stop_after=stop_after,
+            available_only=available_only,
+        ):
+            results[update.rank] = update.result
+        return [results[rank] for rank in sorted(results)]
+
+    @staticmethod
+    def _doc_identifiers(doc: Dict[str, Any], kind: str) -> Set[str]:
+        if kind == "isbn":
+            isbns = doc.get("pnx", {}).get("addata", {}).get("isbn", [])
+            return set().union(*(_isbn_variants(i) for i in isbns))
+        return {OmnisClient._bare_mmsid(doc)}
+
+    @staticmethod
+    def _version_identifiers(version: BookVersion, kind: str) -> Set[str]:
+        if kind == "isbn":
+            return set().union(*(_isbn_variants(i) for i in version.isbns))
+        return {version.mmsid}
+
+    async def _lookup_identifier_chunk(
+        self, wanted: Set[str], clauses: str, kind: str, branch_needles: Sequence[str], fetch_due_dates: bool
+    ) -> List[Tuple[SearchResult, Dict[str, List[Tuple[BranchAvailability, Dict[str, Any]]]]]]:
+        params = self._build_search_params(clauses, limit=50, raw_query=True)
+        docs = (await self._pnxs_search(params)).get("docs", [])
+        direct = [d for d in docs if self._doc_identifiers(d, kind) & wanted]
+
+        # A multi-edition work is represented by one of its editions, not necessarily
+        # the one asked for; re-running the same identifier query inside the group
+        # returns exactly the matching editions.
+        async def matching_editions(doc: Dict[str, Any]) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+            group_params = self._build_search_params(
+                clauses,
+                qInclude=f"facet_frbrgroupid,exact,{self._extract_frbrgroupid(doc)}",
+                limit=50,
+                came_from="addFacet",
+                raw_query=True,
+            )
+            group_docs = (await self._pnxs_search(group_params)).get("docs", [])
+            return group_params, [d for d in group_docs if self._doc_identifiers(d, kind) & wanted]
+
+        # Several identifiers in the chunk may be editions of one work, of which only the
+        # representative came back: while any wanted form is still unmatched, matched
+        # multi-edition works are expanded too (their group search returns the
+        # representative again, so it is dropped from the direct page).
+        matched = set().union(*(self._doc_identifiers(d, kind) for d in direct))
+        expand_direct = bool(wanted - matched)
+        grouped = [d for d in docs if (expand_direct or d not in direct) and not self._is_single_version(d)]
+        direct = [d for d in direct if d not in grouped]
+        pages = [(params, direct)] + list(await asyncio.gather(*(matching_editions(d) for d in grouped)))
+
+        async def with_delivery(
+            page_params: Dict[str, str], page_docs: List[Dict[str, Any]]
+        ) -> List[Tuple[SearchResult, Dict[str, List[Tuple[BranchAvailability, Dict[str, Any]]]]]]:
+            alma_ids = list(dict.fromkeys(i for i in (self._alma_id(d) for d in page_docs) if i))
+            delivery_by_id = await self._delivery_map(page_params, alma_ids)
+            built = [
+                self._build_search_result(d, [d], delivery_by_id, branch_needles, fetch_due_dates) for d in page_docs
+            ]
+            return [(result, targets) for result, targets in built if result is not None]
+
+        built_pages = await asyncio.gather(*(with_delivery(p, d) for p, d in pages if d))
+        return [entry for page in built_pages for entry in page]
+
+    async def lookup_identifiers(
+        self,
+        identifiers: Sequence[str],
+        kind: str = "isbn",
+        branch_filter: Union[str, Sequence[str], None] = None,
+        fetch_due_dates: bool = True,
+        chunk_size: int = 20,
+    ) -> Dict[str, List[BookVersion]]:
+        """Editions (with per-branch availability) matching known ISBNs or MMS IDs.
+
+        Skips the free-text pipeline: identifiers are OR'ed into one exact search per
+        `chunk_size`, and each chunk's availability comes from one delivery call (plus
+        one search and delivery call per multi-edition work whose representative
+        wasn't the edition asked for). `kind` is "isbn" (either ISBN-10 or -13 form)
+        or "mmsid". Returns the matching editions per identifier as given, in input
+        order; an empty list means nothing in the catalog (or the branch filter) matched,
+        or the identifier isn't well-formed.
+        """
+        if not self.token:
+            raise ValueError("Not logged in")
+        if kind not in _IDENTIFIER_FIELDS:
+            raise ValueError(f"Unknown identifier kind: {kind}")
+        if isinstance(branch_filter, str):
+            branch_filter = [branch_filter]
+        branch_needles = [b.lower() for b in branch_filter or ()]
+        field, precision = _IDENTIFIER_FIELDS[kind]
+
+        # Each identifier as given -> the normalized form searched for, and the forms a
+        # catalog record may carry it in.
+        search_values: Dict[str, str] = {}
+        forms: Dict[str, Set[str]] = {}
+        # Only these normalized forms (digits, and X for ISBNs) go into the query, so a
+        # qualifier or stray punctuation in one identifier can't break its whole chunk.
+        for identifier in identifiers:
+            if kind == "isbn":
+                search_values[identifier] = _isbn_digits(identifier)
+                forms[identifier] = _isbn_variants(identifier)
+            else:
+                match = _MMSID_RE.fullmatch(identifier.strip())
+                search_values[identifier] = match.group(1) if match else ""
+                forms[identifier] = {search_values[identifier]} if match else set()
+        searchable = list(dict.fromkeys(i for i in identifiers if forms[i]))
+        chunks = [searchable[i : i + chunk_size] for i in range(0, len(searchable), chunk_size)]
+
+        chunk_results = await asyncio.gather(
+            *(
+                self._lookup_identifier_chunk(
+                    set().union(*(forms[i] for i in chunk)),
+                    ",OR;".join(f"{field},{precision},{search_values[i]}" for i in chunk),
+                    kind,
+                    branch_needles,
+                    fetch_due_dates,
+                )
+                for chunk in chunks
+            )
+        )
+        built = [entry for chunk in chunk_results for entry in chunk]
+        await asyncio.gather(
+            *(
+                self._enrich_due_dates(bare_mmsid, targets)
+                for _, enrich_targets in built
+                for bare_mmsid, targets in enrich_targets.items()
+            )
+        )
+
+        versions = [(v, self._version_identifiers(v, kind)) for result, _ in built for v in result.versions]
+        return {
+            identifier: [version for version, ids in versions if ids & identifier_forms]
+            for identifier, identifier_forms in forms.items()
+        }
+
+    async def search_many(
+        self, queries: Iterable[str], concurrency: int = 4, **search_options: Any
+    ) -> AsyncIterator[BulkSearchResult]:
+        """Run `search_books` for many queries over this session, yielding each as it completes.
+
+        At most `concurrency` queries run at once (the host scheduler still caps the
+        requests). Identical queries run once, and their result is yielded once per
+        occurrence. Lookups that several queries need (group expansions, physical
+        service ids, due dates) are shared while in flight and cached after; without
+        a `cache`, an in-memory one is used for the duration of the batch. A query
+        that fails with an HTTP or budget error, or gets an undecodable response, is
+        reported through `BulkSearchResult.error` rather than ending the batch.
+        `search_options` are passed to `search_books`.
+        """
+        occurrences = Counter(queries)
+        # The batch's tasks run in their own context; a client without a cache gets an
+        # in-memory one there only, so concurrent calls on this client don't see it.
+        context = contextvars.copy_context()
+        if self.cache is None:
+            context.run(_batch_cache.set, CacheStore())
+        loop = asyncio.get_running_loop()
+
+        async def search_one(query: str) -> BulkSearchResult:
+            try:
+                results = await self.search_books(query, **search_options)
+            except (httpx.HTTPError, SearchBudgetExceeded, ValueError) as e:
+                return BulkSearchResult(query=query, error=str(e) or type(e).__name__)
+            return BulkSearchResult(query=query, results=results)
+
+        remaining_queries = iter(occurrences)
+        running: Set["asyncio.Task[BulkSearchResult]"] = set()
+
+        def top_up() -> None:
+            while len(running) < concurrency:
+                query = next(remaining_queries, None)
+                if query is None:
+                    return
+                running.add(loop.create_task(search_one(query), context=context))
+
+        try:
+            top_up()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.discard(task)
+                    outcome = task.result()
+                    for _ in range(occurrences[outcome.query]):
+                        yield outcome
+                top_up()
+        finally:
+            for task in running:
+                task.cancel()
 
     async def close(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
         if self._close_client:
             await self.client.aclose()
@@ -0,0 +1,103 @@
+"""Local SQLite copy of each account's loan history.
+
+The `type=history` loan list only ever grows, and the server lists it newest
+first. `OmnisClient.sync_loan_history` therefore only downloads pages until it
+reaches a loan already stored here, and `get_loans(loan_type="history")` is then
+answered from this store: after the first full download, a sync costs one or
+two requests instead of the whole history.
+
+Loans are kept as the raw API records, so nothing the server sends is lost and
+the `Loan` model can change without invalidating the store.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set, Union
+
+
+class LoanHistoryStore:
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        """`path` defaults to an in-memory database (history for this process only)."""
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        # Each sync appends one batch; within a batch, `position` keeps the server's order.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS loans ("
+            " account TEXT NOT NULL,"
+            " loan_id TEXT NOT NULL,"
+            " batch INTEGER NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (account, loan_id))"
+        )
+
+    @staticmethod
+    def key(base_url: str, institution: str, username: str) -> str:
+        return f"{base_url.rstrip('/')}|{institution}|{username}"
+
+    def known_ids(self, account: str) -> Set[str]:
+        rows = self._db.execute("SELECT loan_id FROM loans WHERE account = ?", (account,))
+        return {row[0] for row in rows}
+
+    def _insert(self, account: str, records: Sequence[Dict[str, Any]]) -> int:
+        known = self.known_ids(account)
+        fresh: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            loan_id = record.get("loanid")
+            if loan_id and loan_id not in known:
+                fresh.setdefault(loan_id, record)
+        if not fresh:
+            return 0
+        batch = self._db.execute("SELECT COALESCE(MAX(batch), 0) + 1 FROM loans WHERE account = ?", (account,))
+        batch_no = batch.fetchone()[0]
+        self._db.executemany(
+            "INSERT INTO loans (account, loan_id, batch, position, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (account, loan_id, batch_no, position, json.dumps(record, ensure_ascii=False))
+                for position, (loan_id, record) in enumerate(fresh.items())
+            ],
+        )
+        return len(fresh)
+
+    def add(self, account: str, records: Sequence[Dict[str, Any]]) -> int:
+        """Store raw loan records (newest first) ahead of everything stored so far.
+
+        Records already in the store are skipped; returns how many were new.
+        """
+        self._db.execute("BEGIN")
+        try:
+            added = self._insert(account, records)
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return added
+
+    def replace(self, account: str, records: Sequence[Dict[str, Any]]) -> int:
+        """Swap the account's stored history for `records` (newest first), in one transaction."""
+        self._db.execute("BEGIN")
+        try:
+            self._db.execute("DELETE FROM loans WHERE account = ?", (account,))
+            added = self._insert(account, records)
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return added
+
+    def records(self, account: str) -> List[Dict[str, Any]]:
+        """The account's stored raw loan records, newest first."""
+        rows = self._db.execute(
+            "SELECT data FROM loans WHERE account = ? ORDER BY batch DESC, position", (account,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, account: str) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM loans WHERE account = ?", (account,)).fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
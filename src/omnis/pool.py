@@ -0,0 +1,67 @@
+"""Shared HTTP transport for running many accounts against the same tenant.
+
+Every standalone `OmnisClient` owns its own `httpx.AsyncClient`, i.e. its own
+connection pool, so N accounts on one Primo host pay N TLS handshakes. A pool
+hands out sessions whose `httpx.AsyncClient`s are thin per-account wrappers
+(separate cookie jars, so logins never leak between accounts) around a single
+keep-alive transport per base_url.
+"""
+
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .client import OmnisClient
+from .scheduler import HostScheduler
+
+
+class OmnisClientPool:
+    def __init__(
+        self,
+        http2: bool = False,
+        limits: Optional[httpx.Limits] = None,
+        timeout: float = 30.0,
+        max_concurrency_per_host: int = 6,
+        **client_options: Any,
+    ):
+        """`http2` needs the optional `h2` package (`pip install omnis-py[http2]`).
+
+        All sessions share one `HostScheduler`, so `max_concurrency_per_host` caps the
+        whole run rather than each account. Extra keyword arguments (e.g.
+        `session_store`, `retry_policy`) are passed to every `OmnisClient`.
+        """
+        self.http2 = http2
+        self.limits = limits or httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        self.timeout = timeout
+        self.client_options = client_options
+        self.scheduler = HostScheduler(max_concurrency_per_host)
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+
+    def _transport(self, base_url: str) -> httpx.AsyncHTTPTransport:
+        key = base_url.rstrip("/")
+        if key not in self._transports:
+            self._transports[key] = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+        return self._transports[key]
+
+    def session(self, base_url: str = "https://omnis-br.primo.exlibrisgroup.com") -> OmnisClient:
+        """Return a new `OmnisClient` for one account, sharing this pool's connections to `base_url`.
+
+        Closing the returned client is harmless but does not release connections;
+        they stay open for other sessions until the pool itself is closed.
+        """
+        http_client = httpx.AsyncClient(
+            transport=self._transport(base_url), follow_redirects=True, timeout=self.timeout
+        )
+        return OmnisClient(base_url, client=http_client, scheduler=self.scheduler, **self.client_options)
+
+    async def close(self) -> None:
+        transports = list(self._transports.values())
+        self._transports.clear()
+        for transport in transports:
+            await transport.aclose()
+
+    async def __aenter__(self) -> "OmnisClientPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
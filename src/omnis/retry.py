@@ -0,0 +1,101 @@
+"""Retry and hedging policy for requests to Primo.
+
+Primo answers load with 429s and the occasional 502/503; without retries those
+either abort a whole command or, in the best-effort enrichment calls, quietly
+turn into missing due dates. `RetryPolicy` decides whether and how long to wait
+before trying again; `LatencyTracker` remembers recent latencies so slow
+idempotent calls can be hedged with a duplicate once they pass a percentile.
+"""
+
+import random
+import re
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, FrozenSet, Optional
+
+import httpx
+
+RETRY_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header, given either as delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        statuses: FrozenSet[int] = RETRY_STATUSES,
+        jitter: Callable[[], float] = random.random,
+    ):
+        """`attempts` counts the first try, so `attempts=1` disables retrying."""
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+        self.jitter = jitter
+
+    def should_retry_response(self, response: httpx.Response, idempotent: bool) -> bool:
+        # A 429 means the request was refused before being processed, so even a
+        # non-idempotent call is safe to repeat; other statuses only for idempotent ones.
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in self.statuses
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based).
+
+        An explicit Retry-After wins (capped at `max_delay`); otherwise "full jitter"
+        exponential backoff, so concurrent callers don't retry in lockstep.
+        """
+        if response is not None:
+            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        return self.jitter() * min(self.max_delay, self.base_delay * (2**attempt))
+
+
+class LatencyTracker:
+    """Rolling latency samples per endpoint, used to decide when to hedge a request."""
+
+    def __init__(self, percentile: float = 0.95, window: int = 100, min_samples: int = 20):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        # Collapse record ids, so e.g. every /pnxs/L/alma<mmsid> shares one bucket.
+        parsed = httpx.URL(url)
+        return f"{method} {parsed.host}{_DIGITS_RE.sub('#', parsed.path)}"
+
+    def record(self, key: str, seconds: float) -> None:
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(seconds)
+
+    def threshold(self, key: str) -> Optional[float]:
+        """Latency at the configured percentile, or None until enough samples exist."""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return ordered[index]
@@ -0,0 +1,81 @@
+"""Per-host concurrency limiting with request priorities.
+
+A single `search_books` call fans out into dozens of group searches, delivery
+calls and due-date lookups against the same Primo host. Letting them all fly
+at once gets us throttled, so every request first takes a slot from its host's
+limiter; when slots are scarce, waiting requests are admitted by priority
+(then FIFO), so the calls that produce results go ahead of enrichment.
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Tuple
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+
+    HIGH = 0  # top-level/group searches and delivery: what the first results are built from
+    NORMAL = 1  # account endpoints, physical service lookups
+    LOW = 2  # due-date enrichment, cover probes
+
+
+class _HostLimiter:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+
+    def release(self) -> None:
+        # Hand the slot straight to the best live waiter instead of freeing it, so a
+        # newly arriving request can't jump the queue.
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class HostScheduler:
+    def __init__(self, max_per_host: int = 6):
+        if max_per_host < 1:
+            raise ValueError("max_per_host must be at least 1")
+        self.max_per_host = max_per_host
+        self._hosts: Dict[str, _HostLimiter] = {}
+        self._seq = itertools.count()
+
+    def _limiter(self, host: str) -> _HostLimiter:
+        if host not in self._hosts:
+            self._hosts[host] = _HostLimiter(self.max_per_host)
+        return self._hosts[host]
+
+    async def acquire(self, host: str, priority: int = Priority.NORMAL) -> None:
+        limiter = self._limiter(host)
+        if limiter.active < limiter.limit and not limiter.waiters:
+            limiter.active += 1
+            return
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(limiter.waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we got cancelled; pass it on.
+                limiter.release()
+            raise
+
+    def release(self, host: str) -> None:
+        self._hosts[host].release()
+
+    @asynccontextmanager
+    async def slot(self, host: str, priority: int = Priority.NORMAL) -> AsyncIterator[None]:
+        await self.acquire(host, priority)
+        try:
+            yield
+        finally:
+            self.release(host)
@@ -0,0 +1,78 @@
+"""Opt-in on-disk store for login sessions (JWT + cookie jar).
+
+`OmnisClient.login` costs a discovery page load plus a `suprimaLogin` POST. The
+JWT it returns carries its own `exp` claim, so a session saved here can be
+restored on the next run and reused until it expires (or the server rejects it
+with a 401, at which point the client logs in again and overwrites the entry).
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class StoredSession(BaseModel):
+    token: str
+    expires_at: float
+    cookies: List[Dict[str, Any]] = []
+
+
+class SessionStore:
+    """JSON file of sessions keyed by base_url/institution/username.
+
+    The file holds bearer tokens, so it is written with owner-only permissions.
+    """
+
+    def __init__(self, path: Union[str, Path], leeway: float = 60.0):
+        self.path = Path(path)
+        # Treat a token as expired slightly early, so it doesn't run out mid-run.
+        self.leeway = leeway
+
+    @staticmethod
+    def key(base_url: str, institution: str, username: str) -> str:
+        return f"{base_url.rstrip('/')}|{institution}|{username}"
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self, base_url: str, institution: str, username: str) -> Optional[StoredSession]:
+        entry = self._read().get(self.key(base_url, institution, username))
+        if not entry:
+            return None
+        try:
+            session = StoredSession(**entry)
+        except ValueError:
+            return None
+        if session.expires_at - self.leeway <= time.time():
+            return None
+        return session
+
+    def save(self, base_url: str, institution: str, username: str, session: StoredSession) -> None:
+        data = self._read()
+        now = time.time()
+        # Drop anything already expired while we're rewriting the file anyway.
+        data = {k: v for k, v in data.items() if isinstance(v, dict) and v.get("expires_at", 0) > now}
+        data[self.key(base_url, institution, username)] = session.model_dump()
+        self._write(data)
+
+    def discard(self, base_url: str, institution: str, username: str) -> None:
+        data = self._read()
+        if data.pop(self.key(base_url, institution, username), None) is not None:
+            self._write(data)
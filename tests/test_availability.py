@@ -0,0 +1,50 @@
+from omnis.availability import availability_matrix, best_branch
+from omnis.client import BookVersion, BranchAvailability, SearchResult
+
+
+def _work(title, *editions):
+    versions = [
+        BookVersion(
+            mmsid=f"{title}-{i}",
+            title=title,
+            branches=[
+                BranchAvailability(library_name=name, library_code=name[-2:], status=status)
+                for name, status in branches
+            ],
+        )
+        for i, branches in enumerate(editions)
+    ]
+    return SearchResult(title=title, versions=versions)
+
+
+def test_availability_matrix_keeps_best_copy_per_work_and_branch():
+    results = [
+        _work("T. 1", [("Filia 35", "unavailable")], [("Filia 35", "available"), ("Filia 14", "unavailable")]),
+        _work("T. 2", [("Filia 14", "available")]),
+    ]
+
+    matrix = availability_matrix(results)
+
+    assert matrix.works == ["T. 1", "T. 2"]
+    assert matrix.branches == ["Filia 14", "Filia 35"]
+    assert matrix.cells[0]["Filia 35"].status == "available"
+    assert "Filia 35" not in matrix.cells[1]
+    assert matrix.available_at("Filia 14") == [1]
+
+
+def test_best_branch_counts_volumes_split_across_works_and_honours_preference():
+    results = [
+        _work("Płomień i krzyż", [("Filia 62", "available")]),
+        _work("Płomień i krzyż. T. 1", [("Filia 14", "available")]),
+        _work("T. 2", [("Filia 14", "available"), ("Filia 62", "available")]),
+        _work("T. 3", [("Filia 14", "unavailable"), ("Filia 62", "unavailable")]),
+    ]
+    matrix = availability_matrix(results)
+    volumes = {"1": [0, 1], "2": [2], "3": [3]}
+
+    choice = best_branch(matrix, volumes, preferred=["filia 62", "filia 14"])
+
+    assert choice is not None
+    assert (choice.branch, choice.volumes, choice.missing) == ("Filia 62", ["1", "2"], ["3"])
+    assert best_branch(matrix, volumes).branch == "Filia 14"
+    assert best_branch(availability_matrix(results[3:])) is None
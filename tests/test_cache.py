@@ -0,0 +1,29 @@
+from omnis.cache import CacheStore
+
+
+def test_cache_store_round_trip_and_persistence(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    store = CacheStore(path)
+    store.set("pnx", "tenant|991", {"display": {"title": ["Płomień i krzyż"]}})
+    store.close()
+
+    reopened = CacheStore(path)
+    entry = reopened.get("pnx", "tenant|991")
+    assert entry is not None
+    assert entry.value == {"display": {"title": ["Płomień i krzyż"]}}
+    assert entry.age >= 0
+    # Namespaces don't collide.
+    assert reopened.get("cover", "tenant|991") is None
+    reopened.close()
+
+
+def test_cache_store_evicts_least_recently_used_entries():
+    store = CacheStore(max_entries=10)
+    store.set("pnx", "keep", 1)
+    for i in range(127):
+        store.get("pnx", "keep")
+        store.set("pnx", str(i), i)
+
+    assert store.count() == 10
+    assert store.get("pnx", "keep") is not None
+    assert store.get("pnx", "0") is None
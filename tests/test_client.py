@@ -1,6 +1,21 @@
+import asyncio
+import base64
+import json
+import time
+
+import httpx
 import pytest
 import respx
-from omnis.client import OmnisClient
+from omnis.cache import CacheStore
+from omnis.client import Loan, OmnisClient, SearchBudgetExceeded, SearchDepth, _batch_cache, _isbn_variants
+from omnis.history import LoanHistoryStore
+from omnis.retry import RetryPolicy
+from omnis.sessions import SessionStore, StoredSession
+
+
+def _jwt(payload):
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    return f"eyJhbGciOiJIUzI1NiJ9.{encoded}.signature"
 
 
 def _doc(
@@ -61,6 +76,67 @@ async def test_login_success():
         assert client.token == token
 
 
+@pytest.mark.asyncio
+async def test_login_persists_session_and_next_client_skips_login(tmp_path):
+    store = SessionStore(tmp_path / "sessions.json")
+    token = _jwt({"displayName": "Test User", "exp": int(time.time()) + 3600})
+
+    with respx.mock:
+        search_route = respx.get("https://omnis-br.primo.exlibrisgroup.com/discovery/search").respond(
+            200, headers={"Set-Cookie": "JSESSIONID=abc; Path=/"}
+        )
+        login_route = respx.post("https://omnis-br.primo.exlibrisgroup.com/primaws/suprimaLogin").respond(
+            200, json={"jwtData": f'"{token}"'}
+        )
+        first = OmnisClient(session_store=store)
+        await first.login("user", "pass")
+        await first.close()
+
+        second = OmnisClient(session_store=store)
+        restored = await second.login("user", "pass")
+        await second.close()
+
+    assert restored == token
+    assert search_route.call_count == 1
+    assert login_route.call_count == 1
+    assert second.client.cookies.get("JSESSIONID") == "abc"
+
+
+@pytest.mark.asyncio
+async def test_restored_session_rejected_with_401_logs_in_again(tmp_path):
+    store = SessionStore(tmp_path / "sessions.json")
+    stale = _jwt({"exp": int(time.time()) + 3600, "n": 1})
+    fresh = _jwt({"exp": int(time.time()) + 3600, "n": 2})
+    store.save(
+        "https://omnis-br.primo.exlibrisgroup.com",
+        "48OMNIS_BRP",
+        "user",
+        StoredSession(token=stale, expires_at=time.time() + 3600),
+    )
+
+    client = OmnisClient(session_store=store)
+    with respx.mock:
+        respx.get("https://omnis-br.primo.exlibrisgroup.com/discovery/search").respond(200)
+        respx.post("https://omnis-br.primo.exlibrisgroup.com/primaws/suprimaLogin").respond(
+            200, json={"jwtData": f'"{fresh}"'}
+        )
+        fines_route = respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/fines")
+        fines_route.side_effect = [
+            httpx.Response(401),
+            httpx.Response(200, json={"data": {}}),
+        ]
+
+        await client.login("user", "pass")
+        assert client.token == stale
+        fines = await client.get_fines()
+
+    assert fines == []
+    assert client.token == fresh
+    assert fines_route.calls[1].request.headers["Authorization"] == f"Bearer {fresh}"
+    saved = store.load("https://omnis-br.primo.exlibrisgroup.com", "48OMNIS_BRP", "user")
+    assert saved is not None and saved.token == fresh
+
+
 @pytest.mark.asyncio
 async def test_get_loans_success():
     client = OmnisClient()
@@ -415,3 +491,979 @@ async def test_get_requests_requires_login():
     client = OmnisClient()
     with pytest.raises(ValueError):
         await client.get_requests()
+
+
+@pytest.mark.asyncio
+async def test_get_record_details_served_from_cache_and_revalidated_when_stale():
+    cache = CacheStore()
+    client = OmnisClient(cache=cache, cache_ttls={"pnx": 0.0, "pnx_stale": 3600.0})
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    url = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub/pnxs/L/alma991"
+
+    with respx.mock:
+        route = respx.get(url)
+        route.side_effect = [
+            httpx.Response(200, json={"pnx": {"display": {"publisher": ["Old"]}, "addata": {}}}),
+            httpx.Response(200, json={"pnx": {"display": {"publisher": ["New"]}, "addata": {}}}),
+        ]
+
+        first = await client.get_record_details("991")
+        # Past the TTL but within the stale window: answered from cache, refreshed in the background.
+        second = await client.get_record_details("991")
+        await client.close()
+
+    assert first.publisher == "Old"
+    assert second.publisher == "Old"
+    assert route.call_count == 2
+    assert cache.get("pnx", "https://omnis-br.primo.exlibrisgroup.com|48OMNIS_BRP|991").value["display"] == {
+        "publisher": ["New"]
+    }
+
+    # Fresh entries need no network at all.
+    fresh_client = OmnisClient(cache=cache)
+    fresh_client.view = "48OMNIS_BRP:BRACZ"
+    fresh_client.institution = "48OMNIS_BRP"
+    with respx.mock:
+        details = await fresh_client.get_record_details("991")
+    assert details.publisher == "New"
+
+
+@pytest.mark.asyncio
+async def test_get_cover_urls_probes_each_isbn_once_across_records():
+    # A local stand-in for covers.openlibrary.org: ISBNs without a cover redirect to a placeholder.
+    client = OmnisClient(cover_url_template="http://covers.local/b/isbn/{isbn}-M.jpg")
+    with respx.mock:
+        hit = respx.head("http://covers.local/b/isbn/111-M.jpg").respond(200)
+        miss = respx.head("http://covers.local/b/isbn/222-M.jpg").respond(
+            302, headers={"Location": "http://covers.local/images/blank.jpg"}
+        )
+        respx.head("http://covers.local/images/blank.jpg").respond(200)
+
+        covers = await client.get_cover_urls([["222", "111"], ["111"], ["222"], []])
+
+    assert covers == [
+        "http://covers.local/b/isbn/111-M.jpg",
+        "http://covers.local/b/isbn/111-M.jpg",
+        None,
+        None,
+    ]
+    assert hit.call_count == 1
+    assert miss.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cover_lookups_are_cached_across_clients_including_misses():
+    cache = CacheStore()
+    template = "http://covers.local/b/isbn/{isbn}-M.jpg"
+    with respx.mock:
+        respx.head("http://covers.local/b/isbn/111-M.jpg").respond(200)
+        respx.head("http://covers.local/b/isbn/222-M.jpg").respond(
+            302, headers={"Location": "http://covers.local/images/blank.jpg"}
+        )
+        respx.head("http://covers.local/images/blank.jpg").respond(200)
+
+        first = await OmnisClient(cache=cache, cover_url_template=template).get_cover_urls([["111"], ["222"]])
+
+    # A different account/tenant on the same cache does no cover I/O at all.
+    other = OmnisClient("https://katalogi.bn.org.pl", cache=cache, cover_url_template=template)
+    with respx.mock:
+        second = await other.get_cover_urls([["111"], ["222"]])
+
+    assert first == second == ["http://covers.local/b/isbn/111-M.jpg", None]
+
+
+@pytest.mark.asyncio
+async def test_throttled_or_failed_cover_probes_are_not_cached_as_misses():
+    cache = CacheStore()
+    client = OmnisClient(
+        cache=cache, cover_url_template="http://covers.local/b/isbn/{isbn}-M.jpg", retry_policy=RetryPolicy(attempts=2)
+    )
+    with respx.mock:
+        respx.head("http://covers.local/b/isbn/111-M.jpg").respond(429, headers={"Retry-After": "0"})
+        respx.head("http://covers.local/b/isbn/222-M.jpg").respond(403)
+        respx.head("http://covers.local/b/isbn/333-M.jpg").respond(404)
+
+        assert await client.get_cover_urls([["111"], ["222"], ["333"]]) == [None, None, None]
+
+    assert cache.get("cover_miss", "111") is None
+    assert cache.get("cover_miss", "222") is None
+    assert cache.get("cover_miss", "333") is not None
+
+
+@pytest.mark.asyncio
+async def test_get_record_details_can_skip_cover_and_attach_later():
+    client = OmnisClient(cover_url_template="http://covers.local/b/isbn/{isbn}-M.jpg")
+    client.view = "48OMNIS_BRP:BRACZ"
+    with respx.mock:
+        respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub/pnxs/L/alma991").respond(
+            200, json={"pnx": {"display": {}, "addata": {"isbn": ["111"]}}}
+        )
+        cover_route = respx.head("http://covers.local/b/isbn/111-M.jpg").respond(200)
+
+        details = await client.get_record_details("991", fetch_cover=False)
+        assert details.cover_url is None
+        assert cover_route.call_count == 0
+
+        await client.attach_covers([details])
+
+    assert details.cover_url == "http://covers.local/b/isbn/111-M.jpg"
+
+
+def _unavailable_search_mocks(physical_service_status=200):
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    doc = _doc("almaZ1", "Z1", "Some Book.", "Some Book", "An Author", None, "2020", "Pub", "111", None)
+    respx.get(f"{base}/pub/pnxs").respond(200, json={"docs": [doc]})
+    respx.post(f"{base}/pub/delivery").respond(
+        200,
+        json=[
+            {
+                "pnx": doc["pnx"],
+                "delivery": {
+                    "holding": [
+                        {"mainLocation": "Filia 01", "holdId": "H1", "availabilityStatus": "unavailable"},
+                    ]
+                },
+            }
+        ],
+    )
+    service_route = respx.get(f"{base}/pub/getPhysicalService/Z1").respond(
+        physical_service_status, json={"physicalServiceId": "PS1"}
+    )
+    holdings_route = respx.post(f"{base}/priv/ILSServices/holdings/PS1").respond(
+        200,
+        json={"data": {"itemInfo": {"locations": [{"items": [{"itemstatusname": "Wypożyczony do 01/09/2026"}]}]}}},
+    )
+    return service_route, holdings_route
+
+
+@pytest.mark.asyncio
+async def test_repeat_search_reuses_cached_physical_service_and_due_dates():
+    cache = CacheStore()
+    client = OmnisClient(cache=cache)
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, holdings_route = _unavailable_search_mocks()
+        first = await client.search_books("some book")
+        second = await client.search_books("some book")
+
+    assert first[0].versions[0].branches[0].due_date == "01/09/2026"
+    assert second[0].versions[0].branches[0].due_date == "01/09/2026"
+    assert service_route.call_count == 1
+    assert holdings_route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_physical_service_lookup_is_negatively_cached():
+    client = OmnisClient(cache=CacheStore(), retry_policy=RetryPolicy(attempts=1))
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, holdings_route = _unavailable_search_mocks(physical_service_status=500)
+        await client.search_books("some book")
+        results = await client.search_books("some book")
+
+    assert results[0].versions[0].branches[0].due_date is None
+    assert service_route.call_count == 1
+    assert holdings_route.call_count == 0
+
+
+def _two_branch_unavailable_mocks():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    doc = _doc("almaZ2", "Z2", "Some Book.", "Some Book", "An Author", None, "2020", "Pub", "111", None)
+    respx.get(f"{base}/pub/pnxs").respond(200, json={"docs": [doc]})
+    respx.post(f"{base}/pub/delivery").respond(
+        200,
+        json=[
+            {
+                "pnx": doc["pnx"],
+                "delivery": {
+                    "holding": [
+                        {"mainLocation": "Filia 01", "holdId": "H1", "availabilityStatus": "unavailable"},
+                        {"mainLocation": "Filia 02", "holdId": "H2", "availabilityStatus": "unavailable"},
+                    ]
+                },
+            }
+        ],
+    )
+    respx.get(f"{base}/pub/getPhysicalService/Z2").respond(200, json={"physicalServiceId": "PS2"})
+    return respx.post(f"{base}/priv/ILSServices/holdings/PS2")
+
+
+def _item_location(hold_id, status_name):
+    return {"holdId": hold_id, "items": [{"itemstatusname": status_name}]}
+
+
+@pytest.mark.asyncio
+async def test_due_dates_for_all_branches_of_a_record_come_from_one_holdings_request():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        holdings_route = _two_branch_unavailable_mocks().respond(
+            200,
+            json={
+                "data": {
+                    "itemInfo": {
+                        "locations": [
+                            _item_location("H2", "Wypożyczony do 02/09/2026"),
+                            _item_location("H1", "Wypożyczony - termin zwrotu przekroczony od 01/03/2026"),
+                        ]
+                    }
+                }
+            },
+        )
+        results = await client.search_books("some book")
+
+    branches = {b.library_name: b for b in results[0].versions[0].branches}
+    assert holdings_route.call_count == 1
+    assert len(json.loads(holdings_route.calls[0].request.content)["locations"]) == 2
+    assert (branches["Filia 01"].due_date, branches["Filia 01"].overdue) == ("01/03/2026", True)
+    assert (branches["Filia 02"].due_date, branches["Filia 02"].overdue) == ("02/09/2026", False)
+
+
+@pytest.mark.asyncio
+async def test_due_dates_fall_back_to_per_branch_requests_when_tenant_rejects_batch():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    def respond(request):
+        locations = json.loads(request.content)["locations"]
+        if len(locations) > 1:
+            return httpx.Response(400)
+        return httpx.Response(
+            200, json={"data": {"itemInfo": {"locations": [{"items": [{"itemstatusname": "do 05/09/2026"}]}]}}}
+        )
+
+    with respx.mock:
+        holdings_route = _two_branch_unavailable_mocks().mock(side_effect=respond)
+        results = await client.search_books("some book")
+
+    assert holdings_route.call_count == 3
+    assert [b.due_date for b in results[0].versions[0].branches] == ["05/09/2026", "05/09/2026"]
+    assert client._multi_location_holdings is False
+
+
+@pytest.mark.asyncio
+async def test_iter_search_books_yields_result_before_due_date_update():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        _unavailable_search_mocks()
+        updates = [
+            (u.kind, u.rank, u.done, u.result.versions[0].branches[0].due_date)
+            async for u in client.iter_search_books("some book")
+        ]
+
+    # The first update carries availability only; the due date arrives in a follow-up for the same work.
+    assert updates[0][:3] == ("result", 0, False)
+    assert updates[-1] == ("due_dates", 0, True, "01/09/2026")
+    assert len(updates) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_depth_delivery_skips_due_date_lookups():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, holdings_route = _unavailable_search_mocks()
+        results = await client.search_books("some book", depth=SearchDepth.DELIVERY)
+
+    assert results[0].versions[0].branches[0].status == "unavailable"
+    assert results[0].complete
+    assert service_route.call_count == 0
+    assert holdings_route.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_search_max_requests_marks_result_incomplete():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, _ = _unavailable_search_mocks()
+        # Top-level search + delivery fit; the physical service lookup doesn't.
+        results = await client.search_books("some book", max_requests=2)
+
+    assert results[0].versions[0].branches[0].due_date is None
+    assert not results[0].complete
+    assert service_route.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_search_max_requests_too_small_for_top_level_search_raises():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        _unavailable_search_mocks()
+        with pytest.raises(SearchBudgetExceeded):
+            await client.search_books("some book", max_requests=0)
+
+
+@pytest.mark.asyncio
+async def test_search_deadline_returns_top_level_result_for_unresolved_works():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    async def slow_delivery(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json=[])
+
+    with respx.mock:
+        _unavailable_search_mocks()
+        respx.post("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub/delivery").mock(side_effect=slow_delivery)
+        results = await client.search_books("some book", deadline=0.2)
+
+    assert [r.title for r in results] == ["Some Book"]
+    assert not results[0].complete
+    assert results[0].versions[0].branches == []
+
+
+def _single_edition_search_mocks(frbrtype):
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    docs = [
+        _doc("almaS1", "S1", "First.", "First", "An Author", None, "2020", "Pub", None, "G1"),
+        _doc("almaS2", "S2", "Second.", "Second", "An Author", None, "2021", "Pub", None, "G2"),
+    ]
+    if frbrtype:
+        for doc in docs:
+            doc["pnx"]["facets"]["frbrtype"] = [frbrtype]
+
+    def search(request):
+        group = request.url.params.get("qInclude")
+        matching = [d for d in docs if not group or group.endswith(d["pnx"]["facets"]["frbrgroupid"][0])]
+        return httpx.Response(200, json={"docs": matching})
+
+    search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+    delivery_route = respx.post(f"{base}/pub/delivery").respond(
+        200,
+        json=[
+            {
+                "pnx": d["pnx"],
+                "delivery": {"holding": [{"mainLocation": "Filia 01", "availabilityStatus": "available"}]},
+            }
+            for d in docs
+        ],
+    )
+    return search_route, delivery_route
+
+
+@pytest.mark.asyncio
+async def test_single_edition_works_skip_group_search_and_share_one_delivery_call():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        search_route, delivery_route = _single_edition_search_mocks(frbrtype="6")
+        results = await client.search_books("some book")
+
+    assert [r.title for r in results] == ["First", "Second"]
+    assert all(r.versions[0].branches[0].status == "available" for r in results)
+    assert search_route.call_count == 1
+    assert delivery_route.call_count == 1
+    assert json.loads(delivery_route.calls[0].request.content) == ["almaS1", "almaS2"]
+
+
+@pytest.mark.asyncio
+async def test_group_sizes_learned_from_expansion_skip_it_next_time():
+    client = OmnisClient(cache=CacheStore())
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        search_route, _ = _single_edition_search_mocks(frbrtype=None)
+        await client.search_books("some book")
+        assert search_route.call_count == 3  # top-level + one expansion per work
+        await client.search_books("some book")
+
+    assert search_route.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_cached_group_expansion_is_reused_by_another_query():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    client = OmnisClient(cache=CacheStore())
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    top = _doc("almaE1", "E1", "Work.", "Work", "An Author", "Wyd. 2", "2020", "Pub", None, "G9")
+    editions = [top, _doc("almaE2", "E2", "Work.", "Work", "An Author", "Wyd. 1", "2010", "Pub", None, "G9")]
+
+    def search(request):
+        return httpx.Response(200, json={"docs": editions if request.url.params.get("qInclude") else [top]})
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+        delivery_route = respx.post(f"{base}/pub/delivery").respond(200, json=[])
+        await client.search_books("work")
+        results = await client.search_books("work an author")
+
+    assert search_route.call_count == 3  # two top-level searches, one group expansion
+    assert [v.edition for v in results[0].versions] == ["Wyd. 2", "Wyd. 1"]
+    # Delivery is asked with the query the cached editions were found with.
+    assert delivery_route.calls[-1].request.url.params["q"] == "any,contains,work"
+
+
+def _two_library_search_mocks(docs_at_branch):
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    doc = _doc("almaB1", "B1", "Book.", "Book", "An Author", None, "2020", "Pub", None, None)
+
+    def search(request):
+        params = request.url.params
+        if "facet_library" in params["qInclude"] or "multiFacets" in params:
+            return httpx.Response(200, json={"docs": [doc] if docs_at_branch else []})
+        return httpx.Response(200, json={"docs": [doc]})
+
+    search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+    holdings = [
+        {"mainLocation": "Filia 35", "libraryCode": "F35", "availabilityStatus": "available"},
+        {"mainLocation": "Filia 14", "libraryCode": "F14", "availabilityStatus": "available"},
+    ]
+    respx.post(f"{base}/pub/delivery").respond(200, json=[{"pnx": doc["pnx"], "delivery": {"holding": holdings}}])
+    return search_route
+
+
+@pytest.mark.asyncio
+async def test_branch_filter_is_pushed_into_search_once_library_code_is_known():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        search_route = _two_library_search_mocks(docs_at_branch=True)
+        await client.search_books("book")
+        results = await client.search_books("book", branch_filter="filia 35")
+
+    assert search_route.calls[0].request.url.params["qInclude"] == ""
+    assert search_route.calls[1].request.url.params["qInclude"] == "facet_library,exact,F35"
+    assert [b.library_name for b in results[0].versions[0].branches] == ["Filia 35"]
+
+
+@pytest.mark.asyncio
+async def test_branch_push_down_falls_back_to_unfiltered_search_when_it_finds_nothing():
+    client = OmnisClient(cache=CacheStore())
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    client.cache.set("library_codes", client._cache_key("index"), {"Filia 35": "F35", "Filia 14": "F14"})
+
+    with respx.mock:
+        search_route = _two_library_search_mocks(docs_at_branch=False)
+        results = await client.search_books("book", branch_filter=["filia 35", "filia 14"])
+
+    assert search_route.calls[0].request.url.params["multiFacets"] == (
+        "facet_library,include,F14|,|facet_library,include,F35"
+    )
+    assert search_route.call_count == 2
+    assert len(results[0].versions[0].branches) == 2
+
+
+@pytest.mark.asyncio
+async def test_several_branch_filters_keep_any_match_and_only_push_down_when_all_are_known():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    client._library_codes = {"Filia 35": "F35", "Filia 14": "F14"}
+
+    with respx.mock:
+        search_route = _two_library_search_mocks(docs_at_branch=True)
+        both = await client.search_books("book", branch_filter=["Filia 35", "Filia 14"])
+        one_unknown = await client.search_books("book", branch_filter=["Filia 35", "Filia 99"])
+
+    assert "multiFacets" in search_route.calls[0].request.url.params
+    assert len(both[0].versions[0].branches) == 2
+    assert "multiFacets" not in search_route.calls[1].request.url.params
+    assert [b.library_name for b in one_unknown[0].versions[0].branches] == ["Filia 35"]
+
+
+@pytest.mark.asyncio
+async def test_branch_fragment_is_not_pushed_down_when_unknown_libraries_may_match():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    # Only Filia 50 has been seen so far; Filia 56 also matches "filia 5".
+    client._library_codes = {"Filia 50": "B50"}
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    doc = _doc("almaB1", "B1", "Book.", "Book", "An Author", None, "2020", "Pub", None, None)
+
+    assert client._library_codes_for(["filia 5"]) == []
+    assert client._library_codes_for(["filia 50"]) == ["B50"]
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").respond(200, json={"docs": [doc]})
+        holdings = [{"mainLocation": "Filia 56", "libraryCode": "B56", "availabilityStatus": "available"}]
+        respx.post(f"{base}/pub/delivery").respond(200, json=[{"pnx": doc["pnx"], "delivery": {"holding": holdings}}])
+        results = await client.search_books("book", branch_filter="filia 5")
+
+    assert search_route.calls[0].request.url.params["qInclude"] == ""
+    assert [b.library_name for b in results[0].versions[0].branches] == ["Filia 56"]
+
+
+def _paged_search_mocks(statuses, total=None):
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    docs = [
+        _doc(f"almaP{i}", f"P{i}", f"Book {i}.", f"Book {i}", "An Author", None, "2020", "Pub", None, None)
+        for i in range(len(statuses))
+    ]
+    status_by_id = {f"almaP{i}": status for i, status in enumerate(statuses)}
+
+    def search(request):
+        offset, limit = int(request.url.params["offset"]), int(request.url.params["limit"])
+        return httpx.Response(200, json={"docs": docs[offset : offset + limit], "info": {"total": total or len(docs)}})
+
+    def delivery(request):
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "pnx": {"control": {"recordid": [rid]}},
+                    "delivery": {"holding": [{"mainLocation": "Filia 01", "availabilityStatus": status_by_id[rid]}]},
+                }
+                for rid in json.loads(request.content)
+            ],
+        )
+
+    respx.post(f"{base}/pub/delivery").mock(side_effect=delivery)
+    return respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+
+
+@pytest.mark.asyncio
+async def test_search_reads_further_pages_up_to_total():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        search_route = _paged_search_mocks(["available", "available", "available"])
+        results = await client.search_books("book", limit=2, max_pages=5)
+
+    assert [r.title for r in results] == ["Book 0", "Book 1", "Book 2"]
+    assert [c.request.url.params["offset"] for c in search_route.calls] == ["0", "2"]
+
+
+@pytest.mark.asyncio
+async def test_search_stops_paging_once_enough_available_works_matched():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        search_route = _paged_search_mocks(["unavailable", "available", "available", "available", "available"])
+        results = await client.search_books(
+            "book", limit=1, max_pages=5, stop_after=1, available_only=True, fetch_due_dates=False
+        )
+
+    assert "Book 0" not in [r.title for r in results]
+    assert "Book 1" in [r.title for r in results]
+    # At most one page is fetched beyond the one that produced the match.
+    assert search_route.call_count <= 3
+
+
+@pytest.mark.asyncio
+async def test_search_many_shares_lookups_across_queries():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, holdings_route = _unavailable_search_mocks()
+        outcomes = []
+        async for outcome in client.search_many(["some book", "some other book", "some book"], concurrency=2):
+            # The batch's cache is invisible to other calls on the client meanwhile.
+            assert client.cache is None and _batch_cache.get() is None
+            outcomes.append(outcome)
+
+    assert sorted(o.query for o in outcomes) == ["some book", "some book", "some other book"]
+    assert all(o.error is None and o.results[0].versions[0].branches[0].due_date == "01/09/2026" for o in outcomes)
+    assert service_route.call_count == 1
+    assert holdings_route.call_count == 1
+    assert client.cache is None
+
+
+@pytest.mark.asyncio
+async def test_search_many_reports_failed_query_and_carries_on():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    client = OmnisClient(retry_policy=RetryPolicy(attempts=1))
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    def search(request):
+        if "broken" in request.url.params["q"]:
+            return httpx.Response(500)
+        if "garbled" in request.url.params["q"]:
+            return httpx.Response(200, text="<html>maintenance</html>")
+        return httpx.Response(200, json={"docs": []})
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+        queries = ["broken", "fine", "garbled", "fine"]
+        outcomes = [o async for o in client.search_many(queries, concurrency=1, fetch_due_dates=False)]
+
+    by_query = {o.query: o for o in outcomes}
+    assert by_query["broken"].error and by_query["garbled"].error
+    assert by_query["fine"].error is None and by_query["fine"].results == []
+    # The repeated query is searched once but reported for each occurrence.
+    assert sorted(o.query for o in outcomes) == sorted(queries)
+    assert search_route.call_count == 3
+
+
+def test_isbn_variants_cover_both_forms():
+    assert _isbn_variants("0-306-40615-2") == {"0306406152", "9780306406157"}
+    assert _isbn_variants("9780306406157 (oprawa)") == {"9780306406157", "0306406152"}
+    assert _isbn_variants("(brak)") == set()
+    assert _isbn_variants("0-8044-2957-x") == {"080442957X", "9780804429573"}
+    assert _isbn_variants("X123456789") == {"X123456789"}
+    assert _isbn_variants("978X123456789") == {"978X123456789"}
+
+
+@pytest.mark.asyncio
+async def test_lookup_identifiers_batches_isbns_and_finds_non_representative_editions():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    single = _doc("almaI1", "I1", "Single.", "Single", "An Author", None, "2020", "Pub", "9780306406157", None)
+    representative = _doc("almaI2", "I2", "Work.", "Work", "An Author", "Wyd. 2", "2021", "Pub", "1111111111", "GB")
+    wanted_edition = _doc("almaI3", "I3", "Work.", "Work", "An Author", "Wyd. 1", "2010", "Pub", "9788324012345", "GB")
+
+    def search(request):
+        if request.url.params["qInclude"]:
+            return httpx.Response(200, json={"docs": [wanted_edition]})
+        return httpx.Response(200, json={"docs": [single, representative]})
+
+    def delivery(request):
+        items = [
+            {
+                "pnx": {"control": {"recordid": [rid]}},
+                "delivery": {"holding": [{"mainLocation": "Filia 01", "availabilityStatus": "available"}]},
+            }
+            for rid in json.loads(request.content)
+        ]
+        return httpx.Response(200, json=items)
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+        delivery_route = respx.post(f"{base}/pub/delivery").mock(side_effect=delivery)
+        found = await client.lookup_identifiers(["0-306-40615-2", "978-83-240-1234-5", "9999999999"])
+
+    assert search_route.calls[0].request.url.params["q"] == (
+        "isbn,exact,0306406152,OR;isbn,exact,9788324012345,OR;isbn,exact,9999999999"
+    )
+    assert [v.mmsid for v in found["0-306-40615-2"]] == ["I1"]
+    assert [v.edition for v in found["978-83-240-1234-5"]] == ["Wyd. 1"]
+    assert found["978-83-240-1234-5"][0].branches[0].status == "available"
+    assert found["9999999999"] == []
+    assert search_route.call_count == 2
+    assert delivery_route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_identifiers_expands_a_work_whose_representative_matched_another_isbn():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    second = _doc("almaI2", "I2", "Work.", "Work", "An Author", "Wyd. 2", "2021", "Pub", "9788324000001", "GB")
+    first = _doc("almaI3", "I3", "Work.", "Work", "An Author", "Wyd. 1", "2010", "Pub", "9788324012345", "GB")
+    second["pnx"]["facets"]["frbrtype"] = ["5"]
+
+    def search(request):
+        # Primo folds both editions into the representative, unless asked within the group.
+        return httpx.Response(200, json={"docs": [second, first] if request.url.params["qInclude"] else [second]})
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").mock(side_effect=search)
+        respx.post(f"{base}/pub/delivery").respond(200, json=[])
+        found = await client.lookup_identifiers(["9788324000001", "9788324012345"], fetch_due_dates=False)
+
+    assert {k: [v.mmsid for v in vs] for k, vs in found.items()} == {
+        "9788324000001": ["I2"],
+        "9788324012345": ["I3"],
+    }
+    assert search_route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_identifiers_searches_normalized_forms_and_checks_mmsid_hits():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest"
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+    wanted = _doc("almaM1", "991234", "Book.", "Book", "An Author", None, "2020", "Pub", None, None)
+    # Free-text hit that merely mentions the id somewhere.
+    unrelated = _doc("almaM2", "995555", "Other.", "Other", "991234", None, "2020", "Pub", None, None)
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pub/pnxs").respond(200, json={"docs": [wanted, unrelated]})
+        respx.post(f"{base}/pub/delivery").respond(200, json=[])
+        await client.lookup_identifiers(["978-83-240-1234-5 (oprawa)", "83-240-1234-5, 2 egz.;"])
+        found = await client.lookup_identifiers(["alma991234", "99;1"], kind="mmsid", fetch_due_dates=False)
+
+    assert search_route.calls[0].request.url.params["q"] == ("isbn,exact,9788324012345,OR;isbn,exact,8324012345")
+    assert search_route.calls[1].request.url.params["q"] == "any,contains,991234"
+    assert [v.mmsid for v in found["alma991234"]] == ["991234"]
+    assert found["99;1"] == []
+
+
+@pytest.mark.asyncio
+async def test_get_record_details_many_batches_and_fetches_the_rest_singly():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub"
+    client = OmnisClient()
+    client.view = "48OMNIS_BRP:BRACZ"
+    docs = [
+        {"pnx": {"control": {"sourcerecordid": [m]}, "display": {"publisher": [f"Pub {m}"]}, "addata": {}}}
+        for m in ("991", "992")
+    ]
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pnxs").respond(200, json={"docs": docs})
+        single_route = respx.get(f"{base}/pnxs/L/alma993").respond(
+            200, json={"pnx": {"display": {"publisher": ["Pub 993"]}, "addata": {}}}
+        )
+        details = await client.get_record_details_many(["991", "992", "993", "991"], fetch_cover=False)
+
+    assert search_route.calls[0].request.url.params["q"] == ("any,contains,991,OR;any,contains,992,OR;any,contains,993")
+    assert list(details) == ["991", "992", "993"]
+    assert [d.publisher for d in details.values()] == ["Pub 991", "Pub 992", "Pub 993"]
+    assert single_route.call_count == 1
+    assert client._pnx_search_by_id is True
+
+
+@pytest.mark.asyncio
+async def test_get_record_details_many_stops_batching_where_search_finds_nothing():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub"
+    client = OmnisClient()
+    client.view = "48OMNIS_BRP:BRACZ"
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pnxs").respond(200, json={"docs": []})
+        respx.get(f"{base}/pnxs/L/alma991").respond(200, json={"pnx": {"display": {}, "addata": {}}})
+        respx.get(f"{base}/pnxs/L/alma992").respond(404)
+        first = await client.get_record_details_many(["991", "992"], fetch_cover=False)
+        await client.get_record_details_many(["991", "992"], fetch_cover=False)
+
+    assert list(first) == ["991"]
+    assert search_route.call_count == 1
+    assert client._pnx_search_by_id is False
+
+
+@pytest.mark.asyncio
+async def test_get_record_details_many_keeps_batching_after_a_failed_search():
+    base = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub"
+    client = OmnisClient(retry_policy=RetryPolicy(attempts=1))
+    client.view = "48OMNIS_BRP:BRACZ"
+
+    with respx.mock:
+        search_route = respx.get(f"{base}/pnxs").respond(503)
+        respx.get(f"{base}/pnxs/L/alma991").respond(200, json={"pnx": {"display": {}, "addata": {}}})
+        respx.get(f"{base}/pnxs/L/alma992").respond(200, json={"pnx": {"display": {}, "addata": {}}})
+        details = await client.get_record_details_many(["991", "992"], fetch_cover=False)
+
+    assert list(details) == ["991", "992"]
+    assert search_route.call_count == 1
+    assert client._pnx_search_by_id is None
+
+
+def _loan_record(loan_id, loan_date="20231201"):
+    return {
+        "loanid": loan_id,
+        "mmsid": f"mms{loan_id}",
+        "title": f"Book {loan_id}",
+        "author": "Test Author",
+        "duedate": "20240101",
+        "duehour": "2359",
+        "loandate": loan_date,
+        "loanstatus": "Active",
+        "ilsinstitutionname": "Library",
+        "mainlocationname": "Branch",
+        "itembarcode": loan_id,
+        "renew": "Y",
+    }
+
+
+def _loans_pages_mock(count):
+    def respond(request):
+        offset, bulk = int(request.url.params["offset"]), int(request.url.params["bulk"])
+        ids = range(offset, min(offset + bulk, count + 1))
+        loans = [_loan_record(str(i)) for i in ids]
+        more = ["Y"] if offset + bulk <= count else []
+        return httpx.Response(200, json={"data": {"loans": {"loan": loans, "showmore": more}}})
+
+    return respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/loans").mock(
+        side_effect=respond
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_loans_fetches_pages_counted_by_get_user_info_concurrently():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client._active_loans_count = 25
+
+    with respx.mock:
+        route = _loans_pages_mock(25)
+        loans = await client.get_loans(page_size=10)
+
+    assert [loan.id for loan in loans] == [str(i) for i in range(1, 26)]
+    assert sorted(int(c.request.url.params["offset"]) for c in route.calls) == [1, 11, 21]
+
+
+@pytest.mark.asyncio
+async def test_get_loans_probes_history_pages_and_keeps_order():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+
+    with respx.mock:
+        route = _loans_pages_mock(35)
+        loans = await client.get_loans(loan_type="history", page_size=10, concurrency=3)
+
+    assert [loan.id for loan in loans] == [str(i) for i in range(1, 36)]
+    # One probe window may run past the end, but not further.
+    assert route.call_count <= 6
+
+
+@pytest.mark.asyncio
+async def test_loan_history_syncs_only_new_pages_into_store():
+    client = OmnisClient(history_store=LoanHistoryStore())
+    client.token = "fake.token.fake"
+    client.institution, client.username = "48OMNIS_TEST", "reader"
+    # Newest first, as the server lists history.
+    history = [_loan_record(str(i)) for i in range(30, 0, -1)]
+
+    def respond(request):
+        offset, bulk = int(request.url.params["offset"]), int(request.url.params["bulk"])
+        page = history[offset - 1 : offset - 1 + bulk]
+        more = ["Y"] if offset - 1 + bulk < len(history) else []
+        return httpx.Response(200, json={"data": {"loans": {"loan": page, "showmore": more}}})
+
+    with respx.mock:
+        route = respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/loans").mock(
+            side_effect=respond
+        )
+        first = await client.get_loans(loan_type="history", page_size=10)
+        route.reset()
+
+        history[:0] = [_loan_record("32"), _loan_record("31")]
+        second = await client.get_loans(loan_type="history", page_size=10)
+
+    assert [loan.id for loan in first] == [str(i) for i in range(30, 0, -1)]
+    assert [loan.id for loan in second] == [str(i) for i in range(32, 0, -1)]
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_iter_loans_yields_first_page_before_later_pages_arrive():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client._active_loans_count = 15
+    first_page_seen = asyncio.Event()
+
+    async def respond(request):
+        offset = int(request.url.params["offset"])
+        if offset > 1:
+            # Only answered once the consumer has the first page in hand.
+            await first_page_seen.wait()
+        loans = [_loan_record(str(i)) for i in range(offset, min(offset + 10, 16))]
+        return httpx.Response(200, json={"data": {"loans": {"loan": loans, "showmore": ["Y"] if offset == 1 else []}}})
+
+    ids = []
+    with respx.mock:
+        respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/loans").mock(
+            side_effect=respond
+        )
+        async for loan in client.iter_loans(page_size=10):
+            ids.append(loan.id)
+            if len(ids) == 10:
+                first_page_seen.set()
+
+    assert ids == [str(i) for i in range(1, 16)]
+
+
+def test_loan_from_api_leaves_record_untouched():
+    record = _loan_record("7")
+    record["renew"] = "N"
+    snapshot = dict(record)
+
+    loan = Loan.from_api(record)
+
+    assert record == snapshot
+    assert (loan.id, loan.renewable) == ("7", False)
+    assert Loan.from_api({**record, "renew": "Y"}).renewable is True
+    assert loan.model_dump(by_alias=True)["renewable"] is False
+
+
+@pytest.mark.asyncio
+async def test_json_loads_hook_decodes_responses():
+    decoded = []
+
+    def loads(content):
+        decoded.append(content)
+        return json.loads(content)
+
+    client = OmnisClient(json_loads=loads)
+    with respx.mock:
+        respx.get("https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub/pnxs").mock(
+            return_value=httpx.Response(200, json={"docs": [], "info": {"total": 0}})
+        )
+        result = await client._pnxs_search({"q": "any,contains,x"})
+
+    assert result == {"docs": [], "info": {"total": 0}}
+    assert len(decoded) == 1
+    assert OmnisClient().json_loads is not None
+
+
+@pytest.mark.asyncio
+async def test_shared_lookup_is_not_charged_to_the_first_searchs_budget():
+    client = OmnisClient()
+    client.token = "fake.token.fake"
+    client.view = "48OMNIS_BRP:BRACZ"
+    client.institution = "48OMNIS_BRP"
+
+    with respx.mock:
+        service_route, holdings_route = _unavailable_search_mocks()
+        # The tight search starts (and would own) the shared due-date lookups, but has
+        # no budget left for the holdings request they need.
+        tight, roomy = await asyncio.gather(
+            client.search_books("some book", max_requests=3),
+            client.search_books("some book", max_requests=50),
+        )
+
+    assert roomy[0].complete
+    assert roomy[0].versions[0].branches[0].due_date == "01/09/2026"
+    assert service_route.call_count == 1
+    assert holdings_route.call_count == 1
@@ -0,0 +1,31 @@
+from omnis.history import LoanHistoryStore
+
+ACCOUNT = LoanHistoryStore.key("https://omnis-br.primo.exlibrisgroup.com/", "48OMNIS_TEST", "reader")
+
+
+def _record(loan_id):
+    return {"loanid": loan_id, "title": f"Book {loan_id}"}
+
+
+def test_later_batches_come_first_and_known_loans_are_skipped():
+    store = LoanHistoryStore()
+    assert store.add(ACCOUNT, [_record("3"), _record("2"), _record("1")]) == 3
+
+    assert store.add(ACCOUNT, [_record("5"), _record("4"), _record("3")]) == 2
+
+    assert [r["loanid"] for r in store.records(ACCOUNT)] == ["5", "4", "3", "2", "1"]
+    assert store.known_ids(ACCOUNT) == {"1", "2", "3", "4", "5"}
+    assert store.records("someone|else") == []
+
+
+def test_replace_swaps_the_whole_history(tmp_path):
+    path = tmp_path / "history.sqlite3"
+    store = LoanHistoryStore(path)
+    store.add(ACCOUNT, [_record("2"), _record("1")])
+
+    store.replace(ACCOUNT, [_record("9")])
+    store.close()
+
+    reopened = LoanHistoryStore(path)
+    assert reopened.records(ACCOUNT) == [_record("9")]
+    assert reopened.count(ACCOUNT) == 1
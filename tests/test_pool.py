@@ -0,0 +1,36 @@
+import pytest
+import respx
+
+from omnis.pool import OmnisClientPool
+
+
+@pytest.mark.asyncio
+async def test_pool_sessions_share_transport_but_not_cookies():
+    async with OmnisClientPool() as pool:
+        first = pool.session("https://omnis-br.primo.exlibrisgroup.com")
+        second = pool.session("https://omnis-br.primo.exlibrisgroup.com/")
+        other_tenant = pool.session("https://katalogi.bn.org.pl")
+
+        assert first.client._transport is second.client._transport
+        assert first.client._transport is not other_tenant.client._transport
+
+        with respx.mock:
+            respx.get("https://omnis-br.primo.exlibrisgroup.com/discovery/search").respond(
+                200, headers={"Set-Cookie": "JSESSIONID=first; Path=/"}
+            )
+            await first.client.get("https://omnis-br.primo.exlibrisgroup.com/discovery/search")
+
+        assert first.client.cookies.get("JSESSIONID") == "first"
+        assert second.client.cookies.get("JSESSIONID") is None
+
+        # Closing a session must not tear down the connections other sessions still use.
+        await first.close()
+        assert not second.client.is_closed
+
+
+def test_pool_passes_client_options_to_sessions(tmp_path):
+    from omnis.sessions import SessionStore
+
+    store = SessionStore(tmp_path / "sessions.json")
+    pool = OmnisClientPool(session_store=store)
+    assert pool.session().session_store is store
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+import respx
+
+from omnis.client import OmnisClient
+from omnis.retry import LatencyTracker, RetryPolicy
+
+FINES_URL = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/fines"
+
+
+def test_retry_policy_honours_retry_after_and_caps_it():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=lambda: 1.0)
+
+    assert policy.delay(0, httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert policy.delay(0, httpx.Response(429, headers={"Retry-After": "120"})) == 5.0
+    http_date = formatdate(time.time() + 3, usegmt=True)
+    assert 0.0 < policy.delay(0, httpx.Response(503, headers={"Retry-After": http_date})) <= 3.0
+    # No header: exponential backoff, capped.
+    assert policy.delay(0) == 1.0
+    assert policy.delay(2) == 4.0
+    assert policy.delay(10) == 5.0
+
+
+def test_latency_tracker_needs_enough_samples_and_buckets_by_endpoint():
+    tracker = LatencyTracker(percentile=0.9, min_samples=10)
+    key = LatencyTracker.key("GET", "https://host/primaws/rest/pub/pnxs/L/alma991234")
+    assert key == LatencyTracker.key("GET", "https://host/primaws/rest/pub/pnxs/L/alma995678")
+
+    for i in range(9):
+        tracker.record(key, 0.1 * (i + 1))
+    assert tracker.threshold(key) is None
+    tracker.record(key, 1.0)
+    assert tracker.threshold(key) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_request_retries_server_errors_for_idempotent_calls():
+    client = OmnisClient(retry_policy=RetryPolicy(base_delay=0))
+    client.token = "fake.token.fake"
+    with respx.mock:
+        route = respx.get(FINES_URL)
+        route.side_effect = [httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"data": {}})]
+
+        fines = await client.get_fines()
+
+    assert fines == []
+    assert route.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_request_gives_up_after_configured_attempts():
+    client = OmnisClient(retry_policy=RetryPolicy(attempts=2, base_delay=0))
+    client.token = "fake.token.fake"
+    with respx.mock:
+        route = respx.get(FINES_URL).respond(503)
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get_fines()
+
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_renew_is_only_retried_when_throttled():
+    client = OmnisClient(retry_policy=RetryPolicy(base_delay=0))
+    client.token = "fake.token.fake"
+    renew_url = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/priv/myaccount/renew_loans"
+    with respx.mock:
+        route = respx.post(renew_url)
+        route.side_effect = [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(500)]
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.renew_loan("L1")
+
+    # The 429 was retried; the 500 on a non-idempotent call was not.
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_record_fetch_is_hedged():
+    client = OmnisClient(hedge_percentile=0.5)
+    client.view = "48OMNIS_BRP:BRACZ"
+    url = "https://omnis-br.primo.exlibrisgroup.com/primaws/rest/pub/pnxs/L/alma991"
+    key = LatencyTracker.key("GET", url)
+    for _ in range(client.latency.min_samples):
+        client.latency.record(key, 0.01)
+
+    calls = 0
+
+    async def respond(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={"pnx": {"display": {"publisher": ["Hedged"]}, "addata": {}}})
+
+    with respx.mock:
+        respx.get(url).mock(side_effect=respond)
+        started = time.monotonic()
+        details = await client.get_record_details("991")
+
+    assert details.publisher == "Hedged"
+    assert calls == 2
+    assert time.monotonic() - started < 2
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from omnis.scheduler import HostScheduler, Priority
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_concurrency_per_host():
+    scheduler = HostScheduler(max_per_host=2)
+    active = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+
+    async def job(host):
+        async with scheduler.slot(host):
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+            await asyncio.sleep(0.01)
+            active[host] -= 1
+
+    await asyncio.gather(*(job("a") for _ in range(6)), *(job("b") for _ in range(6)))
+
+    assert peak == {"a": 2, "b": 2}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_admits_waiters_by_priority_then_fifo():
+    scheduler = HostScheduler(max_per_host=1)
+    order = []
+
+    await scheduler.acquire("host")
+
+    async def job(name, priority):
+        async with scheduler.slot("host", priority):
+            order.append(name)
+
+    tasks = [
+        asyncio.create_task(job("enrich-1", Priority.LOW)),
+        asyncio.create_task(job("search-1", Priority.HIGH)),
+        asyncio.create_task(job("enrich-2", Priority.LOW)),
+        asyncio.create_task(job("search-2", Priority.HIGH)),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release("host")
+    await asyncio.gather(*tasks)
+
+    assert order == ["search-1", "search-2", "enrich-1", "enrich-2"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter_does_not_leak_slot():
+    scheduler = HostScheduler(max_per_host=1)
+    await scheduler.acquire("host")
+
+    waiter = asyncio.create_task(scheduler.acquire("host"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    scheduler.release("host")
+    await asyncio.wait_for(scheduler.acquire("host"), timeout=1)
@@ -0,0 +1,29 @@
+import time
+
+from omnis.sessions import SessionStore, StoredSession
+
+
+def test_session_store_round_trip_and_expiry(tmp_path):
+    store = SessionStore(tmp_path / "sessions.json")
+    base_url = "https://omnis-br.primo.exlibrisgroup.com"
+
+    store.save(base_url, "48OMNIS_BRP", "card1", StoredSession(token="t1", expires_at=time.time() + 3600))
+    store.save(base_url, "48OMNIS_BRP", "card2", StoredSession(token="t2", expires_at=time.time() + 30))
+
+    restored = store.load(base_url, "48OMNIS_BRP", "card1")
+    assert restored is not None
+    assert restored.token == "t1"
+    # Within the leeway window counts as expired.
+    assert store.load(base_url, "48OMNIS_BRP", "card2") is None
+    assert store.load(base_url, "48OMNIS_BRP", "unknown") is None
+    assert (tmp_path / "sessions.json").stat().st_mode & 0o777 == 0o600
+
+    store.discard(base_url, "48OMNIS_BRP", "card1")
+    assert store.load(base_url, "48OMNIS_BRP", "card1") is None
+
+
+def test_session_store_tolerates_corrupt_file(tmp_path):
+    path = tmp_path / "sessions.json"
+    path.write_text("not json")
+    store = SessionStore(path)
+    assert store.load("https://x", "INST", "card") is None